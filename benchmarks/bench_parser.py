@@ -0,0 +1,114 @@
+"""Benchmark parserów stron wyników OLX na zapisanych stronach (bez sieci)
+
+Dla każdej strony z benchmarks/fixtures i każdego parsera mierzy liczbę stron
+na sekundę, czas parsowania jednej karty i szczytowe zużycie pamięci, a przed
+pomiarem sprawdza, czy wszystkie parsery zwracają te same oferty.
+
+Użycie: python benchmarks/bench_parser.py [--repeat N] [--fixtures KATALOG] [--backend NAZWA ...]
+"""
+import os
+import sys
+import glob
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot import OLXScraper, MAX_CARDS, LXML_AVAILABLE  # noqa: E402
+from olx_pages import FIXTURES_DIR, write_fixtures  # noqa: E402
+
+# Pola, które muszą być zgodne między stanem strony a kartami HTML (pozostałe różnią się formatem)
+SHARED_FIELDS = ('id', 'title', 'url', 'price_value', 'state', 'shipping', 'promoted', 'location')
+
+def backends():
+    """Zwraca parsery do porównania: nazwa -> funkcja(html, limit)"""
+    available = {
+        'state': lambda html, limit: OLXScraper.parse_state_offers(html, limit),
+    }
+    for backend in OLXScraper.PARSER_BACKENDS:
+        if backend == 'lxml' and not LXML_AVAILABLE:
+            continue
+        available[backend] = lambda html, limit, backend=backend: OLXScraper.parse_card_offers(html, backend, limit)
+    return available
+
+def check_correctness(name, html, parsers):
+    """Porównuje wyniki parserów - zwraca listę znalezionych różnic"""
+    problems = []
+    for limit in (MAX_CARDS, None):
+        results = {backend: parse(html, limit) for backend, parse in parsers.items()}
+        card_backends = [backend for backend in results if backend != 'state']
+        if not card_backends:
+            continue
+        reference_backend = card_backends[0]
+        reference = results[reference_backend]
+        for backend in card_backends[1:]:
+            if results[backend] != reference:
+                problems.append(f"{name}: {backend} różni się od {reference_backend} (limit={limit})")
+        if 'state' in results:
+            state = [{field: offer.get(field) for field in SHARED_FIELDS} for offer in results['state']]
+            cards = [{field: offer.get(field) for field in SHARED_FIELDS} for offer in reference]
+            if state != cards:
+                problems.append(f"{name}: state różni się od {reference_backend} (limit={limit})")
+    return problems
+
+def measure(parse, html, limit, repeat):
+    """Zwraca (stron na sekundę, µs na kartę, szczyt pamięci w KB) dla jednego parsera"""
+    cards = len(parse(html, limit)) or 1
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        parse(html, limit)
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    parse(html, limit)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return 1 / best, best / cards * 1e6, peak / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20, help="liczba powtórzeń pomiaru (liczy się najlepszy)")
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help="katalog z zapisanymi stronami *.html")
+    parser.add_argument('--backend', action='append', help="mierz tylko wybrane parsery")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.fixtures, '*.html')))
+    if not paths and args.fixtures == FIXTURES_DIR:
+        write_fixtures()
+        paths = sorted(glob.glob(os.path.join(args.fixtures, '*.html')))
+
+    parsers = backends()
+    if args.backend:
+        parsers = {name: parse for name, parse in parsers.items() if name in args.backend}
+
+    pages = {}
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            pages[os.path.splitext(os.path.basename(path))[0]] = f.read()
+
+    problems = []
+    for name, html in pages.items():
+        problems.extend(check_correctness(name, html, parsers))
+    if problems:
+        print("Parsery zwracają różne oferty:")
+        for problem in problems:
+            print(f"  {problem}")
+    else:
+        print(f"Poprawność: wszystkie parsery ({', '.join(parsers)}) zwracają te same oferty")
+
+    print()
+    print(f"{'strona':<10} {'KB':>5} {'parser':<12} {'limit':>5} {'karty':>5} {'strony/s':>9} {'µs/karta':>9} {'pamięć KB':>10}")
+    for name, html in pages.items():
+        for backend, parse in parsers.items():
+            for limit in (MAX_CARDS, None):
+                cards = len(parse(html, limit))
+                pages_per_second, per_card, peak = measure(parse, html, limit, args.repeat)
+                print(f"{name:<10} {len(html) / 1024:>5.0f} {backend:<12} {limit or '-':>5} {cards:>5} "
+                      f"{pages_per_second:>9.1f} {per_card:>9.1f} {peak:>10.0f}")
+
+    return 1 if problems else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,341 @@
+"""Symulacja obciążenia: tysiące monitorowań na atrapie OLX i atrapie Discorda
+
+Uruchamia w osobnym procesie lokalny serwer HTTP udający OLX (strony generowane
+przez olx_pages z zadanym tempem pojawiania się nowych ofert) i przepuszcza przez
+prawdziwą ścieżkę bota (check_offers -> FetchEngine -> dedup -> DeliveryQueue)
+N syntetycznych monitorowań, wysyłając wiadomości do atrapy kanałów Discorda.
+Dla każdego N raportuje czas rundy, percentyle czasu pobrania, opóźnienie
+dostarczenia ofert i zużycie pamięci.
+
+Użycie: python benchmarks/load_sim.py [--monitors 100,1000,5000] [--cycles 3] [--rate 0.5] ...
+"""
+import os
+import sys
+import time
+import socket
+import random
+import asyncio
+import argparse
+import tempfile
+import multiprocessing
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import olx_pages  # noqa: E402
+
+PAGE_SIZE = 40  # Liczba ogłoszeń na stronie wyników OLX
+
+class StubOLX:
+    """Atrapa OLX - dla każdej frazy trzyma listę ogłoszeń, do której dopisuje nowe w tempie rate na minutę
+
+    Nad wynikami pierwszej strony wyświetla kilka starszych ogłoszeń promowanych (--promoted),
+    które zmieniają się przy każdym przesunięciu czasu, jak wyróżnienia na OLX.
+    """
+
+    def __init__(self, rate, latency, promoted=0, seed=0):
+        self.rate = rate
+        self.latency = latency
+        self.promoted = promoted
+        self.rng = random.Random(seed)
+        self.listings = {}  # Ścieżka wyszukiwania -> ogłoszenia od najnowszego
+        self.featured = {}  # Ścieżka wyszukiwania -> pula starszych ogłoszeń promowanych
+        self.rotation = 0
+        self.pages = {}  # (ścieżka, strona) -> gotowy HTML
+        self.next_id = 900000000
+
+    def new_ad(self):
+        self.next_id += 1
+        return olx_pages.make_ad(self.rng, self.next_id, datetime.now(timezone.utc))
+
+    def promoted_ads(self, path):
+        if path not in self.featured:
+            pool = []
+            for _ in range(self.promoted * 3):
+                self.next_id += 1
+                created = datetime.now(timezone.utc) - timedelta(days=self.rng.randint(2, 20))
+                pool.append(olx_pages.make_ad(self.rng, self.next_id, created, promoted=True))
+            self.featured[path] = pool
+        pool = self.featured[path]
+        return [pool[(self.rotation + index) % len(pool)] for index in range(self.promoted)] if pool else []
+
+    def listing(self, path):
+        if path not in self.listings:
+            # Nowe wyszukiwanie zaczyna z pełną stroną starszych ogłoszeń
+            self.listings[path] = [self.new_ad() for _ in range(PAGE_SIZE)]
+        return self.listings[path]
+
+    def poisson(self, mean):
+        # Algorytm Knutha - wystarczający dla małych średnich
+        limit, count, product = pow(2.718281828459045, -mean), 0, self.rng.random()
+        while product > limit:
+            count += 1
+            product *= self.rng.random()
+        return count
+
+    def advance(self, minutes):
+        """Dopisuje nowe ogłoszenia, które pojawiłyby się na OLX przez podany czas"""
+        added = 0
+        for path, ads in self.listings.items():
+            new = [self.new_ad() for _ in range(self.poisson(self.rate * minutes))]
+            ads[:0] = reversed(new)
+            del ads[PAGE_SIZE * 10:]
+            added += len(new)
+        self.rotation += self.promoted
+        self.pages.clear()
+        return added
+
+    async def handle(self, request):
+        from aiohttp import web
+        await asyncio.sleep(self.latency)
+        page = int(request.query.get('page', '1'))
+        key = (request.path, page)
+        if key not in self.pages:
+            ads = self.listing(request.path)[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+            if page == 1:
+                ads = self.promoted_ads(request.path) + ads
+            self.pages[key] = olx_pages.render_page(ads)
+        return web.Response(text=self.pages[key], content_type='text/html')
+
+    async def handle_advance(self, request):
+        from aiohttp import web
+        return web.json_response({'added': self.advance(float(request.query['minutes']))})
+
+    async def handle_reset(self, request):
+        from aiohttp import web
+        self.listings.clear()
+        self.featured.clear()
+        self.pages.clear()
+        return web.json_response({})
+
+def run_stub(port, rate, latency, promoted):
+    from aiohttp import web
+    stub = StubOLX(rate, latency, promoted)
+    app = web.Application()
+    app.router.add_post('/_advance', stub.handle_advance)
+    app.router.add_post('/_reset', stub.handle_reset)
+    app.router.add_get('/{tail:.*}', stub.handle)
+    web.run_app(app, host='127.0.0.1', port=port, print=None, access_log=None)
+
+class FakeChannel:
+    """Atrapa kanału Discorda - zapisuje wysłane wiadomości i opóźnienie dostarczenia ofert"""
+
+    def __init__(self, channel_id, sink):
+        self.id = channel_id
+        self.sink = sink
+
+    async def send(self, content=None, embeds=None, view=None, **kwargs):
+        await asyncio.sleep(self.sink.send_latency)
+        now = time.time()
+        self.sink.messages += 1
+        for embed in embeds or []:
+            self.sink.offers += 1
+            if (self.id, embed.url) in self.sink.sent:
+                self.sink.redundant += 1
+            self.sink.sent.add((self.id, embed.url))
+            if embed.url in self.sink.promoted:
+                self.sink.promoted_sent += 1
+            created = self.sink.created.pop(embed.url, None)
+            if created:
+                self.sink.lags.append(now - created)
+        if content:
+            self.sink.summaries += 1
+
+class DiscordSink:
+    def __init__(self, send_latency):
+        self.send_latency = send_latency
+        self.channels = {}
+        self.created = {}  # URL oferty -> czas pojawienia się na OLX
+        self.promoted = set()  # URL-e ofert promowanych
+        self.reset()
+
+    def reset(self):
+        self.messages = 0
+        self.offers = 0
+        self.summaries = 0
+        self.redundant = 0  # Oferty wysłane ponownie na ten sam kanał
+        self.promoted_sent = 0
+        self.sent = set()  # (kanał, URL) wysłanych ofert
+        self.lags = []
+
+    def get_channel(self, channel_id):
+        if channel_id not in self.channels:
+            self.channels[channel_id] = FakeChannel(channel_id, self)
+        return self.channels[channel_id]
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def make_configs(bot, count, distinct, channels, seed=0):
+    """Tworzy syntetyczne monitorowania - część z nich szuka tych samych fraz"""
+    rng = random.Random(seed)
+    queries = [f"{rng.choice(olx_pages.PRODUCTS)} {index}" for index in range(max(1, int(count * distinct)))]
+    user_configs = {}
+    for index in range(count):
+        user_id = str(100000000000000000 + index % max(1, count // 3))
+        user_configs.setdefault(user_id, []).append(bot.Monitor.create(index + 1, user_id, {
+            'query': rng.choice(queries),
+            'category': None,
+            'min_price': rng.choice([None, None, '100']),
+            'max_price': rng.choice([None, None, '5000']),
+            'delivery': None,
+            'condition': None,
+            'location': None,
+            'channel_id': 1000 + index % channels,
+            'sort_by': 'newest'
+        }))
+    return user_configs
+
+async def simulate(bot, sink, stub_url, count, args):
+    """Uruchamia kilka rund check_offers dla count monitorowań i zwraca zmierzone wartości"""
+    import aiohttp
+
+    state_dir = tempfile.mkdtemp(prefix='load_sim_')
+    bot.user_configs.clear()
+    bot.user_configs.update(make_configs(bot, count, args.distinct, args.channels))
+    bot.seen_offers = bot.SeenStore(os.path.join(state_dir, 'seen.db'))
+    bot.seen_offers.open()
+    bot.dedup_index = bot.DedupIndex(bot.seen_offers, capacity=max(100000, count * 200))
+    await bot.dedup_index.rebuild()
+    bot.scheduler = bot.PollScheduler()
+    bot.delivery_queue = bot.DeliveryQueue()
+    bot.fetch_engine.cache.clear()
+    sink.reset()
+
+    # Zapamiętanie czasu pojawienia się oferty na OLX - do pomiaru opóźnienia dostarczenia
+    enqueue = bot.delivery_queue.enqueue
+    def record_enqueue(channel_id, offer, monitor):
+        if offer.get('created'):
+            sink.created[offer['url']] = offer['created']
+        if offer.get('promoted'):
+            sink.promoted.add(offer['url'])
+        enqueue(channel_id, offer, monitor)
+    bot.delivery_queue.enqueue = record_enqueue
+
+    fetch_latencies = []
+    fetch_once = type(bot.fetch_engine).fetch_once
+    async def timed_fetch_once(self, *fetch_args, **fetch_kwargs):
+        started = time.perf_counter()
+        try:
+            return await fetch_once(self, *fetch_args, **fetch_kwargs)
+        finally:
+            fetch_latencies.append(time.perf_counter() - started)
+    bot.fetch_engine.fetch_once = timed_fetch_once.__get__(bot.fetch_engine)
+
+    async with aiohttp.ClientSession() as control:
+        await control.post(f"{stub_url}/_reset")
+        cycle_times = []
+        drain_times = []
+        for cycle in range(args.cycles):
+            if cycle:
+                await control.post(f"{stub_url}/_advance", params={'minutes': str(bot.INTERVAL)})
+            # Wszystkie monitorowania są w terminie - mierzymy pełną rundę
+            monitor_ids = [monitor.id for monitors in bot.user_configs.values() for monitor in monitors]
+            now = time.monotonic()
+            bot.scheduler.sync(monitor_ids, now)
+            for monitor_id in monitor_ids:
+                bot.scheduler.push(monitor_id, now)
+
+            started = time.perf_counter()
+            await bot.check_offers()
+            cycle_times.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            while any(queue.worker and not queue.worker.done() for queue in bot.delivery_queue.channels.values()):
+                await asyncio.sleep(0.05)
+            drain_times.append(time.perf_counter() - started)
+
+    del bot.fetch_engine.fetch_once
+    bot.seen_offers.close()
+    return {
+        'monitors': count,
+        'searches': len(bot.plan_searches(monitor for monitors in bot.user_configs.values() for monitor in monitors)),
+        'cycle': max(cycle_times),
+        'fetches': len(fetch_latencies),
+        'p50': percentile(fetch_latencies, 0.5) * 1000,
+        'p95': percentile(fetch_latencies, 0.95) * 1000,
+        'p99': percentile(fetch_latencies, 0.99) * 1000,
+        'offers': sink.offers,
+        'messages': sink.messages,
+        'summaries': sink.summaries,
+        'redundant': sink.redundant,
+        'promoted': sink.promoted_sent,
+        'lag50': percentile(sink.lags, 0.5),
+        'lag95': percentile(sink.lags, 0.95),
+        'drain': max(drain_times),
+        'rss': rss_mb(),
+    }
+
+async def main_async(args, stub_url):
+    import bot
+    sink = DiscordSink(args.send_ms / 1000)
+    bot.bot.get_channel = sink.get_channel
+    await bot.fetch_engine.start()
+
+    print(f"{'monitor.':>8} {'zapytań':>7} {'runda s':>8} {'pobrań':>7} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} "
+          f"{'oferty':>7} {'powt.':>6} {'prom.':>6} {'wiad.':>6} {'podsum.':>7} {'lag50 s':>8} {'lag95 s':>8} {'kolejka s':>9} {'RSS MB':>7}")
+    try:
+        for count in args.monitors:
+            result = await simulate(bot, sink, stub_url, count, args)
+            overrun = " ! runda dłuższa niż INTERVAL" if result['cycle'] > bot.INTERVAL * 60 else ""
+            print(f"{result['monitors']:>8} {result['searches']:>7} {result['cycle']:>8.2f} {result['fetches']:>7} "
+                  f"{result['p50']:>7.1f} {result['p95']:>7.1f} {result['p99']:>7.1f} {result['offers']:>7} "
+                  f"{result['redundant']:>6} {result['promoted']:>6} {result['messages']:>6} {result['summaries']:>7} "
+                  f"{result['lag50']:>8.2f} {result['lag95']:>8.2f} {result['drain']:>9.2f} {result['rss']:>7.1f}{overrun}")
+    finally:
+        await bot.fetch_engine.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--monitors', default='100,1000,5000', type=lambda value: [int(part) for part in value.split(',')],
+                        help="liczby monitorowań do sprawdzenia, oddzielone przecinkami")
+    parser.add_argument('--distinct', type=float, default=0.3, help="udział unikalnych fraz wśród monitorowań")
+    parser.add_argument('--channels', type=int, default=20, help="liczba kanałów Discorda")
+    parser.add_argument('--cycles', type=int, default=3, help="liczba rund na każde N")
+    parser.add_argument('--rate', type=float, default=0.5, help="nowe oferty na minutę dla jednej frazy")
+    parser.add_argument('--promoted', type=int, default=4, help="liczba ofert promowanych nad wynikami pierwszej strony")
+    parser.add_argument('--latency-ms', type=float, default=80, help="opóźnienie odpowiedzi atrapy OLX")
+    parser.add_argument('--send-ms', type=float, default=30, help="opóźnienie wysłania wiadomości do atrapy Discorda")
+    parser.add_argument('--rps', type=float, default=200, help="limit zapytań na sekundę (OLX_REQUESTS_PER_SECOND)")
+    parser.add_argument('--concurrency', type=int, default=20, help="limit równoległych zapytań (MAX_CONCURRENT_REQUESTS)")
+    args = parser.parse_args()
+
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    stub = multiprocessing.Process(target=run_stub, args=(port, args.rate, args.latency_ms / 1000, args.promoted), daemon=True)
+    stub.start()
+    stub_url = f"http://127.0.0.1:{port}"
+
+    # Konfiguracja bota przed jego importem - zapytania trafiają do atrapy OLX
+    state_dir = tempfile.mkdtemp(prefix='load_sim_')
+    os.environ['OLX_BASE_URL'] = stub_url
+    os.environ['OLX_REQUESTS_PER_SECOND'] = str(args.rps)
+    os.environ['OLX_BURST'] = str(max(1, int(args.rps)))
+    os.environ['MAX_CONCURRENT_REQUESTS'] = str(args.concurrency)
+    os.environ['SEEN_DB_PATH'] = os.path.join(state_dir, 'seen.db')
+    os.environ['MONITOR_DB_PATH'] = os.path.join(state_dir, 'monitors.db')
+
+    for _ in range(50):
+        with socket.socket() as probe:
+            if probe.connect_ex(('127.0.0.1', port)) == 0:
+                break
+        time.sleep(0.1)
+    try:
+        asyncio.run(main_async(args, stub_url))
+    finally:
+        stub.terminate()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""Generator stron wyników OLX do benchmarków i symulacji obciążenia
+
+Strony odwzorowują znaczniki prawdziwych wyników OLX: osadzony stan
+(window.__PRERENDERED_STATE__) oraz karty data-cy="l-card" z tymi samymi
+atrybutami, z których korzysta OLXScraper. Zapisane w fixtures/ strony można
+zastąpić lub uzupełnić stronami zapisanymi z OLX.
+"""
+import os
+import json
+import random
+from datetime import datetime, timedelta, timezone
+from html import escape
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Nazwa fixture -> (liczba kart, liczba kart promowanych na górze listy)
+FIXTURES = {
+    'small': (3, 0),
+    'typical': (20, 2),
+    'large': (48, 4),
+    'promoted': (40, 16),
+}
+
+PRODUCTS = ["iPhone 13", "PlayStation 5", "Rower górski", "Laptop Lenovo", "Sofa narożna", "Opony zimowe", "Aparat Sony", "Biurko dębowe"]
+CITIES = [("Warszawa", "Mokotów"), ("Kraków", "Podgórze"), ("Gdańsk", "Wrzeszcz"), ("Poznań", None), ("Wrocław", "Krzyki")]
+STATES = [("new", "Nowe"), ("used", "Używane"), ("damaged", "Uszkodzone")]
+
+def make_ad(rng, ad_id, created, promoted=False):
+    """Tworzy ogłoszenie w formacie stanu strony OLX"""
+    product = rng.choice(PRODUCTS)
+    city, district = rng.choice(CITIES)
+    state, _ = rng.choice(STATES)
+    price = rng.randrange(50, 9000, 10)
+    slug = product.lower().replace(' ', '-').replace('ó', 'o')
+    return {
+        'id': ad_id,
+        'title': f"{product} {rng.choice(['stan idealny', 'okazja', 'jak nowy', 'pilne', 'z gwarancją'])}",
+        'url': f"https://www.olx.pl/d/oferta/{slug}-CID99-ID{ad_id:x}.html",
+        'isPromoted': promoted,
+        'createdTime': created.isoformat(),
+        'price': {
+            'displayValue': f"{price:,} zł".replace(',', ' '),
+            'regularPrice': {'value': price, 'currencyCode': 'PLN', 'negotiable': rng.random() < 0.4},
+            'free': False,
+            'exchange': False,
+        },
+        'location': {'cityName': city, 'districtName': district},
+        'photos': [f"https://ireland.apollo.olxcdn.com:443/v1/files/{ad_id:x}-PL/image;s={{width}}x{{height}}"],
+        'delivery': {'rock': {'active': rng.random() < 0.5}},
+        'params': [{'key': 'state', 'name': 'Stan', 'normalizedValue': state, 'value': dict(STATES)[state]}],
+    }
+
+def render_card(ad):
+    """Renderuje kartę ogłoszenia tak jak na liście wyników OLX"""
+    path = ad['url'].replace('https://www.olx.pl', '')
+    if ad['isPromoted']:
+        # Karty promowane prowadzą do oferty przez adres z parametrem śledzącym
+        path += '?reason=extended_search_promoted'
+    title = escape(ad['title'])
+    price = ad['price']
+    negotiable = '<span class="css-1c0ed4l">do negocjacji</span>' if price['regularPrice']['negotiable'] else ''
+    featured = '<div data-testid="adCard-featured" class="css-1jh69qu">Wyróżnione</div>' if ad['isPromoted'] else ''
+    delivery = '<span data-testid="delivery-icon" class="css-1b3ql3r"></span>' if ad['delivery']['rock']['active'] else ''
+    state_label = next(param['value'] for param in ad['params'] if param['key'] == 'state')
+    city = ad['location']['cityName']
+    if ad['location']['districtName']:
+        city += f", {ad['location']['districtName']}"
+    created = datetime.fromisoformat(ad['createdTime'])
+    image = ad['photos'][0].replace('{width}', '200').replace('{height}', '0')
+    return (
+        f'<div data-cy="l-card" data-testid="l-card" data-visually-ready-trigger-element="true" id="{ad["id"]}" class="css-1sw7q4x">'
+        f'<div type="list" class="css-1apmciz"><div class="css-1ut25fa">'
+        f'<a class="css-z3gu2d" href="{path}"><div class="css-gl6djm"><div type="list" class="css-1ao4pe8">'
+        f'<img src="{image}" srcset="{image} 200w" alt="{title}" sizes="216px" class="css-8wsg1m"></div></div></a>{featured}</div>'
+        f'<div class="css-1ut25fa"><div data-cy="ad-card-title" class="css-u2ayx9">'
+        f'<a class="css-z3gu2d" href="{path}"><h6 class="css-1wxaaza">{title}</h6></a>'
+        f'<p data-testid="ad-price" class="css-13afqrm">{price["displayValue"]}{negotiable}</p></div>'
+        f'<div class="css-odp1qd"><span title="{state_label}" class="css-3lkihg"><span class="css-1wduofd">{state_label}</span></span>{delivery}</div>'
+        f'<div class="css-odp1qd"><p data-testid="location-date" class="css-1mwdrlh">{escape(city)} - {created:%d.%m.%Y %H:%M}</p>'
+        f'<span data-testid="observed-button" class="css-1r4fvk"><svg width="24" height="24" viewBox="0 0 24 24"><path d="M20.219 10.367 12 20.419"></path></svg></span>'
+        f'</div></div></div></div>'
+    )
+
+def render_page(ads, with_state=True):
+    """Renderuje całą stronę wyników - nagłówek, skrypty, stan strony i karty ogłoszeń"""
+    state = {'listing': {'listing': {'ads': ads, 'totalElements': len(ads), 'totalPages': 25}}}
+    state_script = f'<script id="olx-init-config">window.__PRERENDERED_STATE__= {json.dumps(json.dumps(state, ensure_ascii=False))};\nwindow.__TAURUS__ = {{}};</script>' if with_state else ''
+    # Nagłówek i nawigacja o rozmiarze zbliżonym do prawdziwej strony
+    head_filler = ''.join(f'<link rel="preload" href="https://static.olx.pl/static/olxpl/packed/{i}.chunk.js" as="script">' for i in range(60))
+    style_filler = '<style>' + ''.join(f'.css-{i:x}{{display:flex;margin:{i % 16}px;color:#{i * 4099 % 0xffffff:06x}}}' for i in range(800)) + '</style>'
+    nav_filler = ''.join(f'<li class="css-1ux1z2w"><a href="/kategoria-{i}/" class="css-1lcz6o7">Kategoria {i}</a></li>' for i in range(120))
+    cards = ''.join(render_card(ad) for ad in ads)
+    return (
+        '<!DOCTYPE html><html lang="pl"><head><meta charset="utf-8"><title>Ogłoszenia - OLX.pl</title>'
+        f'{head_filler}{style_filler}{state_script}</head><body><div id="root"><header><nav><ul>{nav_filler}</ul></nav></header>'
+        f'<main><form data-testid="search-form"><input name="q" value=""></form>'
+        f'<div data-testid="listing-grid" class="css-oukcj3">{cards}</div>'
+        '<section data-testid="pagination-wrapper"><a data-testid="pagination-forward" href="?page=2">Następna</a></section>'
+        '</main><footer class="css-1f1e0m">OLX.pl</footer></div></body></html>'
+    )
+
+def generate_ads(count, promoted=0, seed=0, first_id=850000000, now=None):
+    """Tworzy listę ogłoszeń od najnowszego - promowane są na górze, jak na OLX"""
+    rng = random.Random(seed)
+    now = now or datetime(2026, 10, 18, 12, 0, tzinfo=timezone(timedelta(hours=2)))
+    ads = []
+    for index in range(count):
+        if index < promoted:
+            # Promowane ogłoszenia są zwykle starsze - wyróżnienie trzyma je na górze listy
+            ads.append(make_ad(rng, first_id - 5000 - index, now - timedelta(days=rng.randint(2, 20)), promoted=True))
+        else:
+            ads.append(make_ad(rng, first_id - index, now - timedelta(minutes=index * 7)))
+    return ads
+
+def write_fixtures(directory=FIXTURES_DIR):
+    os.makedirs(directory, exist_ok=True)
+    for seed, (name, (count, promoted)) in enumerate(sorted(FIXTURES.items())):
+        html = render_page(generate_ads(count, promoted, seed=seed))
+        with open(os.path.join(directory, f'{name}.html'), 'w', encoding='utf-8', newline='\n') as f:
+            f.write(html)
+        print(f"Zapisano {name}.html ({len(html) / 1024:.0f} KB, {count} kart)")
+
+if __name__ == '__main__':
+    write_fixtures()
@@ -1,28 +1,351 @@
 import os
+import sys
+import asyncio
+import aiohttp
+from aiohttp import web
 import discord
 from discord.ext import commands, tasks
 from discord import ButtonStyle, app_commands
-import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import json
+import math
+from collections import Counter, deque, namedtuple
+import heapq
+import random
+import itertools
+import sqlite3
+import signal
+import socket
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import hashlib
+from array import array
 import time
+import bisect
+import queue
+import logging
+import logging.handlers
+from contextlib import contextmanager
 from datetime import datetime
+from html import unescape
+from urllib.parse import urlencode, urljoin, urlsplit, urlunsplit
 import re
 
 # Konfiguracja bota
 TOKEN = os.getenv('DISCORD_TOKEN')  # Token bota - ustaw w zmiennych środowiskowych
 PREFIX = '!'
-INTERVAL = 2  # Czas między sprawdzeniami w minutach
+OLX_BASE_URL = os.getenv('OLX_BASE_URL', 'https://www.olx.pl')  # Adres OLX dla zapytań wyszukiwania (do testów obciążeniowych)
+INTERVAL = 2  # Początkowy czas między sprawdzeniami w minutach - potem dostosowywany do liczby nowych ofert
+MIN_POLL_INTERVAL = int(os.getenv('MIN_POLL_INTERVAL', '30'))  # Najkrótszy odstęp sprawdzania monitorowania w sekundach
+MAX_POLL_INTERVAL = int(os.getenv('MAX_POLL_INTERVAL', '900'))  # Najdłuższy odstęp sprawdzania monitorowania w sekundach
+PRIME_RAMP_SECONDS = int(os.getenv('PRIME_RAMP_SECONDS', '300'))  # Czas, na który po starcie rozkładamy wstępne (ciche) sprawdzenia wczytanych monitorowań
+POLL_JITTER = 0.15  # Losowe rozrzucenie terminów sprawdzeń (±15% odstępu), aby zapytania nie szły jedną falą
+SCHEDULER_TICK = 5  # Co ile sekund planista sprawdza, które monitorowania są do odpytania
+MAX_CONCURRENT_REQUESTS = int(os.getenv('MAX_CONCURRENT_REQUESTS', '10'))  # Maksymalna liczba równoległych zapytań do OLX
+REQUEST_TIMEOUT = float(os.getenv('REQUEST_TIMEOUT', '15'))  # Limit czasu pojedynczego zapytania w sekundach
+PARSER_BACKEND = os.getenv('PARSER_BACKEND', 'strainer')  # Parser stron wyników: html.parser, strainer lub lxml
+PARSE_WORKERS = int(os.getenv('PARSE_WORKERS', '2'))  # Liczba procesów parsujących strony wyników (0 - parsowanie w pętli zdarzeń)
+PARSE_QUEUE_SIZE = int(os.getenv('PARSE_QUEUE_SIZE', str(max(1, PARSE_WORKERS) * 2)))  # Maksymalna liczba stron przekazanych naraz do parsowania
+MAX_CARDS = 5  # Liczba najnowszych ofert czytanych z pierwszej strony wyników, gdy znacznik jest wśród nich
+MAX_SCAN_PAGES = int(os.getenv('MAX_SCAN_PAGES', '5'))  # Maksymalna liczba stron wyników czytanych w poszukiwaniu znacznika
+WATERMARK_SIZE = 5  # Liczba najnowszych ofert zapamiętanych jako znacznik - wystarczy trafić na jedną z nich
+SEEN_DB_PATH = os.getenv('SEEN_DB_PATH', 'seen_offers.db')  # Plik bazy widzianych ofert
+SEEN_TTL_DAYS = int(os.getenv('SEEN_TTL_DAYS', '30'))  # Po tylu dniach od pierwszego zobaczenia oferta jest zapominana
+SEEN_MAX_ENTRIES = int(os.getenv('SEEN_MAX_ENTRIES', '5000000'))  # Maksymalna liczba zapamiętanych ofert
+MONITOR_DB_PATH = os.getenv('MONITOR_DB_PATH', 'monitors.db')  # Plik bazy monitorowań użytkowników
+WRITE_BEHIND_DELAY = 1.0  # Czas zbierania zmian monitorowań przed zapisem jednym wsadem (w sekundach)
+DEDUP_RING_SIZE = int(os.getenv('DEDUP_RING_SIZE', '64'))  # Liczba ostatnich ofert pamiętanych w RAM dla każdego monitorowania
+BLOOM_CAPACITY = int(os.getenv('BLOOM_CAPACITY', str(SEEN_MAX_ENTRIES)))  # Liczba ofert, dla której filtr Blooma ma ~1% fałszywych trafień
+OLX_REQUESTS_PER_SECOND = float(os.getenv('OLX_REQUESTS_PER_SECOND', '2'))  # Średnia liczba zapytań do OLX na sekundę
+OLX_BURST = int(os.getenv('OLX_BURST', '5'))  # Liczba zapytań, które mogą pójść naraz po okresie bezczynności
+MAX_RETRIES = 3  # Liczba ponowień zapytania odrzuconego przez OLX (429/403/captcha)
+BACKOFF_BASE = 2.0  # Początkowe opóźnienie ponowienia w sekundach - podwajane przy każdej próbie
+BACKOFF_MAX = 60.0  # Maksymalne opóźnienie ponowienia w sekundach
+BREAKER_THRESHOLD = 5  # Liczba zablokowanych zapytań z rzędu, po której wstrzymujemy pobieranie
+BREAKER_COOLDOWN = 300  # Czas wstrzymania pobierania po wykryciu blokady w sekundach (rośnie przy kolejnych blokadach)
+EMBEDS_PER_MESSAGE = 10  # Discord pozwala na maksymalnie 10 embedów w jednej wiadomości
+EMBED_CHARS_PER_MESSAGE = 6000  # Łączny limit znaków wszystkich embedów jednej wiadomości
+EMBED_LISTED_MONITORS = 10  # Liczba monitorowań wypisanych w embedzie oferty wspólnej dla kilku użytkowników kanału
+CHANNEL_QUEUE_SIZE = int(os.getenv('CHANNEL_QUEUE_SIZE', '50'))  # Maksymalna liczba ofert czekających na wysłanie na jeden kanał
+CHANNEL_MESSAGES_PER_SECOND = 1.0  # Limit Discorda dla kanału to 5 wiadomości na 5 sekund
+CHANNEL_BURST = 5
+DELIVERY_BACKEND = os.getenv('DELIVERY_BACKEND', 'channel')  # channel - wysyłka przez kanał, webhook - zatłoczone kanały wysyłają przez pulę webhooków
+WEBHOOK_POOL_SIZE = int(os.getenv('WEBHOOK_POOL_SIZE', '3'))  # Liczba webhooków tworzonych dla jednego zatłoczonego kanału
+WEBHOOK_NAME = 'OLX Monitor'  # Nazwa webhooków tworzonych przez bota - istniejące o tej nazwie są używane ponownie
+WEBHOOK_RETRY = 3600  # Po tylu sekundach ponawiamy próbę utworzenia webhooków na kanale, na którym się nie udała
+DETAILS_CACHE_SIZE = int(os.getenv('DETAILS_CACHE_SIZE', '1000'))  # Liczba szczegółów ofert (przycisk "Szczegóły") trzymanych w pamięci
+DETAILS_TTL = int(os.getenv('DETAILS_TTL', '900'))  # Po tylu sekundach szczegóły oferty są pobierane ponownie
+DETAILS_DESCRIPTION_CHARS = 1500  # Długość opisu oferty pokazywana w szczegółach
+RECENT_SENT_SIZE = 500  # Liczba ostatnio wysłanych ofert zapamiętanych dla kanału - do zliczania powtórnych wysyłek
+KEEPALIVE_TIMEOUT = 60  # Czas utrzymywania bezczynnych połączeń z OLX w sekundach
+SCRAPER_MODE = os.getenv('SCRAPER_MODE', 'local')  # local - bot sam sprawdza oferty, external - sprawdzają je procesy "python bot.py --scraper"
+# Procesy sprawdzające i bot wymieniają dane przez pliki SQLite - muszą działać na tym samym komputerze (wspólnym dysku)
+SCRAPER_WORKERS = int(os.getenv('SCRAPER_WORKERS', '2'))  # Liczba procesów sprawdzających uruchamianych przez bota w trybie external (0 - uruchamiane osobno)
+EVENT_DB_PATH = os.getenv('EVENT_DB_PATH', 'events.db')  # Plik kolejki zdarzeń między procesami sprawdzającymi a botem
+EVENT_POLL_INTERVAL = 1.0  # Co ile sekund bot odbiera nowe oferty z kolejki zdarzeń
+EVENT_BATCH_SIZE = 500  # Maksymalna liczba zdarzeń odbieranych naraz
+HEARTBEAT_INTERVAL = 10  # Co ile sekund proces sprawdzający zgłasza, że działa
+HEARTBEAT_TIMEOUT = 30  # Po tylu sekundach bez zgłoszenia monitorowania procesu sprawdzającego przejmują pozostałe
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')  # Adres endpointu metryk - domyślnie dostępny tylko lokalnie
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))  # Port endpointu /metrics w formacie Prometheus (0 wyłącza endpoint)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)  # Przedziały histogramów czasu w sekundach
+SCRAPER_METRICS_PORT = int(os.getenv('SCRAPER_METRICS_PORT', str(METRICS_PORT + 1 if METRICS_PORT else 0)))  # Port /metrics procesu sprawdzającego - procesy uruchomione przez bota dostają kolejne porty
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')  # Poziom logów: DEBUG, INFO, WARNING, ERROR
+
+# Parser lxml jest opcjonalny - bez niego backend "lxml" korzysta z html.parser
+try:
+    import lxml  # noqa: F401
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+# Kompresja brotli jest dekodowana przez aiohttp tylko jeśli zainstalowany jest pakiet Brotli
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    ACCEPT_ENCODING = 'gzip, deflate'
+
+# Logi trafiają do kolejki, a na konsolę wypisuje je osobny wątek - zapis nie blokuje pętli zdarzeń
+log = logging.getLogger('olx_monitor')
+log_listener = None
+
+def setup_logging(level=LOG_LEVEL):
+    """Kieruje logi bota i discord.py przez kolejkę do wątku, który wypisuje je na konsolę"""
+    global log_listener
+    if log_listener is not None:
+        return
+    records = queue.SimpleQueue()
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter('[%(asctime)s] %(levelname)s %(name)s: %(message)s'))
+    log_listener = logging.handlers.QueueListener(records, console)
+    for name in ('olx_monitor', 'discord'):
+        logger = logging.getLogger(name)
+        logger.addHandler(logging.handlers.QueueHandler(records))
+        logger.setLevel(level)
+        logger.propagate = False
+    log_listener.start()
+
+class Histogram:
+    """Histogram czasu w przedziałach LATENCY_BUCKETS - stała pamięć niezależnie od liczby pomiarów"""
+    __slots__ = ('counts', 'sum', 'count')
+    
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)  # Ostatni przedział to +Inf
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, value):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+    
+    def quantile(self, q):
+        """Przybliżony kwantyl - interpolacja liniowa w przedziale, w którym wypada"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = LATENCY_BUCKETS[index - 1] if index else 0.0
+                if index == len(LATENCY_BUCKETS):
+                    return lower
+                return lower + (LATENCY_BUCKETS[index] - lower) * (rank - seen) / count
+            seen += count
+        return LATENCY_BUCKETS[-1]
+
+class Metrics:
+    """Liczniki i histogramy pętli sprawdzania ofert, udostępniane w formacie Prometheus pod /metrics"""
+    
+    HELP = {
+        'olx_monitor_cycles_total': ('counter', "Liczba zakończonych rund sprawdzania"),
+        'olx_monitor_cycle_seconds': ('histogram', "Czas trwania rundy sprawdzania"),
+        'olx_monitor_stage_seconds': ('histogram', "Czas etapów przetwarzania: fetch, parse, dedup, send"),
+        'olx_monitor_offers_found_total': ('counter', "Oferty znalezione w wynikach (po filtrach monitorowania)"),
+        'olx_monitor_offers_new_total': ('counter', "Nowe oferty skierowane do wysłania"),
+        'olx_monitor_offers_promoted_skipped_total': ('counter', "Pominięte oferty promowane dodane przed ostatnim sprawdzeniem"),
+        'olx_monitor_offers_primed_total': ('counter', "Oferty oznaczone jako widziane bez wysyłania przy wstępnym sprawdzeniu"),
+        'olx_monitor_errors_total': ('counter', "Błędy według etapu i typu wyjątku"),
+        'olx_monitor_http_responses_total': ('counter', "Odpowiedzi OLX według kodu HTTP"),
+        'olx_monitor_events_received_total': ('counter', "Nowe oferty odebrane od procesów sprawdzających"),
+        'olx_monitor_details_requests_total': ('counter', "Kliknięcia przycisku Szczegóły według źródła: cache, fetch, coalesced"),
+    }
+    STAGES = ('fetch', 'parse', 'dedup', 'send')
+    
+    def __init__(self):
+        self.started = time.time()
+        self.counters = Counter()  # (nazwa, etykiety) -> wartość
+        self.histograms = {}  # (nazwa, etykiety) -> Histogram
+        self.collected = {}  # Nazwa -> (typ, opis, funkcja) - wartości odczytywane przy pobraniu metryk
+        self.last_cycle = None  # Podsumowanie ostatniej rundy dla komendy !status
+        self.runner = None
+    
+    @staticmethod
+    def key(name, labels):
+        return name, tuple(sorted(labels.items()))
+    
+    def inc(self, name, value=1, **labels):
+        self.counters[self.key(name, labels)] += value
+    
+    def observe(self, name, value, **labels):
+        key = self.key(name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(value)
+    
+    @contextmanager
+    def timer(self, name, **labels):
+        """Mierzy czas bloku (także z await w środku) i zapisuje go w histogramie"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+    
+    def error(self, stage, error):
+        self.inc('olx_monitor_errors_total', stage=stage, type=type(error).__name__)
+    
+    def collect(self, name, kind, description, read):
+        """Rejestruje wartość odczytywaną dopiero przy pobraniu metryk (głębokości kolejek, liczniki innych obiektów)"""
+        self.collected[name] = (kind, description, read)
+    
+    def histogram(self, name, **labels):
+        return self.histograms.get(self.key(name, labels))
+    
+    def total(self, name, **labels):
+        """Suma licznika po wszystkich etykietach zgodnych z podanymi"""
+        wanted = set(labels.items())
+        return sum(value for (counter, counter_labels), value in self.counters.items() if counter == name and wanted <= set(counter_labels))
+    
+    def errors(self):
+        """Liczba błędów według (etap, typ), od najczęstszych"""
+        counts = Counter()
+        for (name, labels), value in self.counters.items():
+            if name == 'olx_monitor_errors_total':
+                labels = dict(labels)
+                counts[labels['stage'], labels['type']] += value
+        return counts.most_common()
+    
+    @staticmethod
+    def format_labels(labels):
+        if not labels:
+            return ""
+        escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+        return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+    
+    def render(self):
+        """Zwraca wszystkie metryki w formacie tekstowym Prometheus"""
+        lines = []
+        for name in sorted({name for name, _ in self.counters} | {name for name, _ in self.histograms}):
+            kind, description = self.HELP.get(name, ('untyped', name))
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (counter, labels), value in sorted(self.counters.items()):
+                if counter == name:
+                    lines.append(f"{name}{self.format_labels(labels)} {value}")
+            for (histogram_name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                if histogram_name != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{self.format_labels(labels + (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_sum{self.format_labels(labels)} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{self.format_labels(labels)} {histogram.count}")
+        for name, (kind, description, read) in sorted(self.collected.items()):
+            try:
+                value = read()
+            except AttributeError:
+                continue  # Wartości nie ma w tym procesie (np. kolejki kanałów w procesie sprawdzającym)
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+    
+    async def handle(self, request):
+        return web.Response(body=self.render().encode('utf-8'), headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+    
+    async def start_server(self, host=METRICS_HOST, port=METRICS_PORT):
+        """Uruchamia endpoint /metrics na wspólnej pętli zdarzeń bota"""
+        if self.runner is not None or not port:
+            return
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        try:
+            await web.TCPSite(self.runner, host, port).start()
+        except OSError as e:
+            log.error(f"Nie można uruchomić endpointu metryk na {host}:{port}: {e}")
+            await self.runner.cleanup()
+            self.runner = None
+            return
+        log.info(f"Metryki dostępne pod http://{host}:{port}/metrics")
+    
+    async def stop_server(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+metrics = Metrics()
+
+class MonitorBot(commands.Bot):
+    async def setup_hook(self):
+        # Rejestr wczytujemy przed połączeniem z bramą - komenda obsłużona wcześniej dostałaby zajęty identyfikator
+        started = time.perf_counter()
+        user_configs.update(await asyncio.to_thread(registry.load))
+        count = sum(len(configs) for configs in user_configs.values())
+        log.info(f"Wczytano {count} monitorowań w {(time.perf_counter() - started) * 1000:.0f} ms")
+        registry.start()
+    
+    async def close(self):
+        # Zamknięcie wspólnej sesji HTTP i zapisanie widzianych ofert oraz monitorowań przed rozłączeniem bota.
+        # Kroki są niezależne - błąd jednego (np. zablokowana baza) nie może pominąć zapisu monitorowań
+        for step in (stop_scrapers, fetch_engine.close, metrics.stop_server, delivery_queue.close,
+                     seen_offers.close, event_queue.close, registry.close):
+            try:
+                result = step()
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                metrics.error('close', e)
+                log.error(f"Błąd podczas zamykania ({step.__qualname__}): {e}")
+        await super().close()
 
 intents = discord.Intents.default()
 intents.message_content = True
-bot = commands.Bot(command_prefix=PREFIX, intents=intents)
+bot = MonitorBot(command_prefix=PREFIX, intents=intents)
 
 # Przechowywanie konfiguracji użytkowników
 user_configs = {}
-seen_offers = set()
 
 class OLXScraper:
+    HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    }
+    PARSER_BACKENDS = ('html.parser', 'strainer', 'lxml')
+    CARD_STRAINER = SoupStrainer('div', attrs={'data-cy': 'l-card'})
+    CARD_PATTERN = re.compile(r'data-cy=["\']l-card["\']')
+    STATE_PATTERN = re.compile(r'window\.__PRERENDERED_STATE__\s*=\s*')
+    BLOCK_PATTERN = re.compile(r'captcha|access denied|too many requests', re.IGNORECASE)
+    CARD_LINK_PATTERN = re.compile(rb'href="(?:https?://[^/"]+)?(/d/oferta/[^"?#]+)')
+    OFFER_ID_PATTERN = re.compile(r'-ID(\w+)\.html')
+    OFFER_HOSTS = ('olx.pl', 'm.olx.pl', 'www.olx.pl')
+    # Te same wzorce dla surowej odpowiedzi - strona blokady jest wykrywana bez dekodowania HTML w pętli zdarzeń
+    BYTES_PATTERNS = tuple(re.compile(pattern.pattern.encode(), pattern.flags & re.IGNORECASE) for pattern in (STATE_PATTERN, CARD_PATTERN, BLOCK_PATTERN))
+    PRICE_PATTERN = re.compile(r'\d[\d\s\u00a0]*(?:[.,]\d+)?')
+    CONDITION_MAP = {
+        "nowy": "new",
+        "używany": "used",
+        "uszkodzony": "damaged"
+    }
+    STATE_LABELS = {"Nowe": "new", "Używane": "used", "Uszkodzone": "damaged"}
+    # Pola oferty przekazywane z procesów parsujących jako krotki (w tej kolejności)
+    OFFER_FIELDS = ('id', 'title', 'price', 'url', 'img_url', 'delivery', 'location', 'price_value', 'state', 'shipping', 'created', 'promoted')
+    
     @staticmethod
     def parse_price(price_text):
         if not price_text:
@@ -35,11 +358,72 @@ class OLXScraper:
             return price_text.strip()
     
     @staticmethod
-    def search_olx(query, category=None, min_price=None, max_price=None, delivery_option=None, condition=None, location=None, sort_by='newest'):
-        url = f"https://www.olx.pl/oferty/q-{query.replace(' ', '-')}/"
+    def parse_price_value(price_text):
+        """Zamienia tekst ceny (np. "1 299,99 zł do negocjacji") na liczbę - None, jeśli cena nie jest liczbą"""
+        if price_text is None:
+            return None
+        if isinstance(price_text, (int, float)):
+            return float(price_text)
+        if "za darmo" in price_text.lower():
+            return 0.0
+        match = OLXScraper.PRICE_PATTERN.search(price_text)
+        if not match:
+            return None
+        try:
+            return float(re.sub(r'\s', '', match.group()).replace(',', '.'))
+        except ValueError:
+            return None
+    
+    @staticmethod
+    def is_block_page(html):
+        """Sprawdza, czy OLX zamiast wyników zwrócił stronę blokady lub captchy (html jako tekst lub bajty)"""
+        if isinstance(html, str):
+            state_pattern, card_pattern, block_pattern = OLXScraper.STATE_PATTERN, OLXScraper.CARD_PATTERN, OLXScraper.BLOCK_PATTERN
+        else:
+            state_pattern, card_pattern, block_pattern = OLXScraper.BYTES_PATTERNS
+        if state_pattern.search(html) or card_pattern.search(html):
+            return False
+        return bool(block_pattern.search(html))
+    
+    @staticmethod
+    def listing_keys(body):
+        """Szybki odczyt uporządkowanej listy adresów kart z surowej strony - bez parsowania HTML"""
+        # Każda karta ma dwa odnośniki (zdjęcie i tytuł) - zostawiamy pierwsze wystąpienie
+        return list(dict.fromkeys(OLXScraper.CARD_LINK_PATTERN.findall(body)))
+    
+    @staticmethod
+    def normalize_offer_url(url):
+        """Kanoniczny adres oferty - pełny adres www.olx.pl bez parametrów śledzących i kotwicy"""
+        if not url:
+            return ""
+        parts = urlsplit(urljoin('https://www.olx.pl/', url.strip()))
+        host = parts.netloc.lower()
+        if host in OLXScraper.OFFER_HOSTS:
+            host = 'www.olx.pl'
+        return urlunsplit(('https', host, parts.path, '', ''))
+    
+    @staticmethod
+    def offer_id(url, card_id=None):
+        """Kanoniczny identyfikator oferty: id karty (ten sam co w stanie strony), identyfikator z adresu lub sam adres"""
+        if card_id and card_id.isdigit():
+            return card_id
+        match = OLXScraper.OFFER_ID_PATTERN.search(url)
+        return match.group(1) if match else url
+    
+    @staticmethod
+    def offer_key(offer):
+        """Adres karty oferty w postaci zwracanej przez listing_keys"""
+        return urlsplit(offer['url']).path.encode()
+    
+    @staticmethod
+    def build_search_request(query, category=None, min_price=None, max_price=None, delivery_option=None, condition=None, location=None, sort_by='newest'):
+        """Buduje adres URL i parametry zapytania wyszukiwania OLX"""
+        # Normalizacja frazy i kategorii - OLX nie rozróżnia wielkości liter ani wielokrotnych spacji
+        query = '-'.join(query.lower().split())
+        url = f"{OLX_BASE_URL}/oferty/q-{query}/"
         
         if category:
-            url = f"https://www.olx.pl/{category}/q-{query.replace(' ', '-')}/"
+            url = f"{OLX_BASE_URL}/{category.strip().lower()}/q-{query}/"
         
         params = {}
         
@@ -48,9 +432,9 @@ class OLXScraper:
             params['search[order]'] = 'created_at:desc'
         
         if min_price:
-            params['search[filter_float_price:from]'] = min_price
+            params['search[filter_float_price:from]'] = str(min_price).strip()
         if max_price:
-            params['search[filter_float_price:to]'] = max_price
+            params['search[filter_float_price:to]'] = str(max_price).strip()
         
         # Dodanie filtra wysyłki OLX
         if delivery_option == "olx":
@@ -60,93 +444,1492 @@ class OLXScraper:
             
         # Dodanie filtra stanu przedmiotu
         if condition:
-            condition_map = {
-                "nowy": "new",
-                "używany": "used",
-                "uszkodzony": "damaged"
-            }
-            if condition in condition_map:
-                params['search[filter_enum_state][0]'] = condition_map[condition]
+            if condition in OLXScraper.CONDITION_MAP:
+                params['search[filter_enum_state][0]'] = OLXScraper.CONDITION_MAP[condition]
                 
         # Dodanie filtra lokalizacji
         if location:
             params['search[city_id]'] = location  # Wymaga ID miasta z OLX
-            
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
         
+        return url, params
+    
+    @staticmethod
+    def config_request(config):
+        """Zwraca adres URL i parametry wspólnego zapytania dla konfiguracji monitorowania
+        
+        Cena, stan i wysyłka OLX nie trafiają do zapytania - są sprawdzane lokalnie (matches_filters),
+        dzięki czemu monitorowania tej samej frazy z różnymi filtrami korzystają z jednego pobrania.
+        Darmowej wysyłki nie da się rozpoznać na liście wyników, więc ten filtr zostaje w zapytaniu.
+        """
+        return OLXScraper.build_search_request(
+            config['query'],
+            category=config['category'],
+            delivery_option="free" if config.get('delivery') == "free" else None,
+            location=config.get('location'),
+            sort_by=config.get('sort_by', 'newest')  # Domyślnie sortowanie wg najnowszych
+        )
+    
+    @staticmethod
+    def matches_filters(offer, monitor):
+        """Sprawdza, czy oferta ze wspólnego wyniku spełnia filtry ceny, stanu i wysyłki monitorowania"""
+        min_price = monitor.min_price_value
+        max_price = monitor.max_price_value
+        if min_price is not None or max_price is not None:
+            price = offer.get('price_value')
+            if price is None:
+                return False
+            if min_price is not None and price < min_price:
+                return False
+            if max_price is not None and price > max_price:
+                return False
+        
+        # Stan nie zawsze jest widoczny na karcie - oferty o nieznanym stanie przepuszczamy
+        state = monitor.wanted_state
+        if state and offer.get('state') and offer['state'] != state:
+            return False
+        
+        if monitor.delivery == "olx" and not offer.get('shipping'):
+            return False
+        return True
+    
+    @staticmethod
+    def request_signature(url, params):
+        """Sygnatura zapytania - identyczne wyszukiwania mają identyczną sygnaturę"""
+        return f"{url}?{urlencode(sorted((key, str(value)) for key, value in params.items()))}"
+    
+    @staticmethod
+    def find_cards(html, backend=None, limit=None):
+        """Zwraca elementy kart ofert ze strony wyników przy użyciu wybranego parsera"""
+        backend = backend or PARSER_BACKEND
+        
+        # Tryb "stop po N kartach" - obcinamy HTML przed kartą N+1, aby parser nie przetwarzał reszty strony
+        if limit is not None:
+            html = OLXScraper.truncate_cards(html, limit)
+        
+        if backend == 'html.parser':
+            # Pełne drzewo całej strony - najwolniejszy wariant, zostawiony dla porównania
+            soup = BeautifulSoup(html, 'html.parser')
+        elif backend == 'lxml' and LXML_AVAILABLE:
+            soup = BeautifulSoup(html, 'lxml', parse_only=OLXScraper.CARD_STRAINER)
+        else:
+            # Domyślnie budujemy drzewo tylko z poddrzew kart data-cy="l-card"
+            soup = BeautifulSoup(html, 'html.parser', parse_only=OLXScraper.CARD_STRAINER)
+        
+        cards = soup.find_all('div', {'data-cy': 'l-card'})
+        return cards[:limit] if limit is not None else cards
+    
+    @staticmethod
+    def truncate_cards(html, limit):
+        """Obcina HTML tuż przed początkiem karty o numerze limit + 1"""
+        for index, match in enumerate(OLXScraper.CARD_PATTERN.finditer(html)):
+            if index == limit:
+                tag_start = html.rfind('<', 0, match.start())
+                return html[:tag_start] if tag_start != -1 else html
+        return html
+    
+    @staticmethod
+    def parse_card(offer):
+        """Zamienia element karty ogłoszenia na słownik oferty"""
+        # Poprawione pobieranie tytułu - szukamy różnych elementów
+        title_element = offer.find('h6')
+        if not title_element:
+            title_element = offer.find('a').find('h6')
+        if not title_element:
+            title_element = offer.find('a').find('div', {'data-testid': 'listing-ad-title'})
+        if not title_element:
+            all_headings = offer.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
+            if all_headings:
+                title_element = all_headings[0]
+        
+        title = title_element.text.strip() if title_element else "Brak tytułu"
+        
+        url_element = offer.find('a')
+        offer_url = OLXScraper.normalize_offer_url(url_element['href'] if url_element else "")
+        
+        price_element = offer.find('p', {'data-testid': 'ad-price'}) 
+        price = OLXScraper.parse_price(price_element.text) if price_element else "Cena nie podana"
+        
+        img_element = offer.find('img')
+        img_url = img_element['src'] if img_element and 'src' in img_element.attrs else ""
+        
+        # Dodanie informacji o wysyłce
+        delivery_info = "Brak informacji"
+        delivery_element = offer.find('span', {'data-testid': 'delivery-icon'})
+        if delivery_element:
+            delivery_info = "Wysyłka OLX"
+        
+        # Karta ma atrybut id z tym samym numerem ogłoszenia co stan strony
+        offer_id = OLXScraper.offer_id(offer_url, offer.get('id'))
+        
+        location_element = offer.find('p', {'data-testid': 'location-date'})
+        location_text = location_element.text.strip() if location_element else "Brak lokalizacji"
+        
+        # Stan przedmiotu jest widoczny na karcie tylko w niektórych kategoriach
+        state_element = offer.find('span', title=lambda value: value in OLXScraper.STATE_LABELS)
+        
+        return {
+            'id': offer_id,
+            'title': title,
+            'price': price,
+            'url': offer_url,
+            'img_url': img_url,
+            'delivery': delivery_info,
+            'location': location_text,
+            'price_value': OLXScraper.parse_price_value(price_element.text) if price_element else None,
+            'state': OLXScraper.STATE_LABELS[state_element['title']] if state_element else None,
+            'created': None,
+            'promoted': offer.find(attrs={'data-testid': 'adCard-featured'}) is not None,
+            'shipping': bool(delivery_element)
+        }
+    
+    @staticmethod
+    def extract_state(html):
+        """Odczytuje osadzony w stronie stan aplikacji OLX (window.__PRERENDERED_STATE__) bez budowania drzewa DOM"""
+        marker = OLXScraper.STATE_PATTERN.search(html)
+        if not marker:
+            return None
         try:
-            response = requests.get(url, params=params, headers=headers)
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            offers = []
-            offer_elements = soup.find_all('div', {'data-cy': 'l-card'})
-            
-            for offer in offer_elements[:5]:  # Pobieramy tylko 5 najnowszych ofert
+            state, _ = json.JSONDecoder().raw_decode(html, marker.end())
+            # OLX zapisuje stan jako tekst z zakodowanym JSON-em
+            if isinstance(state, str):
+                state = json.loads(state)
+            return state
+        except ValueError as e:
+            metrics.error('parse', e)
+            log.warning(f"Błąd podczas odczytu stanu strony OLX: {e}")
+            return None
+    
+    @staticmethod
+    def parse_state_ad(ad):
+        """Zamienia ogłoszenie ze stanu strony na słownik oferty w tym samym formacie co parse_card"""
+        price_data = ad.get('price') or {}
+        regular_price = price_data.get('regularPrice') or {}
+        if price_data.get('free'):
+            price = "Za darmo"
+        elif price_data.get('exchange'):
+            price = "Zamienię"
+        else:
+            price = OLXScraper.parse_price(price_data.get('displayValue'))
+        
+        photos = ad.get('photos') or []
+        img_url = photos[0].replace('{width}', '400').replace('{height}', '300') if photos else ""
+        
+        delivery = ad.get('delivery') or {}
+        shipping = bool((delivery.get('rock') or {}).get('active'))
+        
+        state = None
+        for param in ad.get('params') or []:
+            if param.get('key') == 'state':
+                state = param.get('normalizedValue')
+        
+        created = None
+        created_text = ""
+        if ad.get('createdTime'):
+            try:
+                created_time = datetime.fromisoformat(ad['createdTime'])
+                created = created_time.timestamp()
+                created_text = created_time.strftime('%d.%m.%Y %H:%M')
+            except ValueError:
+                pass
+        
+        location_data = ad.get('location') or {}
+        location_parts = [part for part in (location_data.get('cityName'), location_data.get('districtName')) if part]
+        location_text = ", ".join(location_parts)
+        if created_text:
+            location_text = f"{location_text} - {created_text}" if location_text else created_text
+        
+        offer_url = OLXScraper.normalize_offer_url(ad.get('url'))
+        
+        return {
+            'id': OLXScraper.offer_id(offer_url, str(ad['id'])),
+            'title': (ad.get('title') or "Brak tytułu").strip(),
+            'price': price,
+            'url': offer_url,
+            'img_url': img_url,
+            'delivery': "Wysyłka OLX" if shipping else "Brak informacji",
+            'location': location_text or "Brak lokalizacji",
+            'price_value': OLXScraper.parse_price_value(regular_price.get('value')) if not price_data.get('free') else 0.0,
+            'state': state,
+            'created': created,
+            'promoted': bool(ad.get('isPromoted')),
+            'shipping': shipping
+        }
+    
+    @staticmethod
+    def parse_state_offers(html, limit=MAX_CARDS):
+        """Wyciąga oferty ze stanu strony - zwraca None, jeśli strona go nie zawiera"""
+        state = OLXScraper.extract_state(html)
+        if not isinstance(state, dict):
+            return None
+        ads = (state.get('listing') or {}).get('listing', {}).get('ads')
+        if not isinstance(ads, list):
+            return None
+        
+        offers = []
+        for ad in ads[:limit] if limit is not None else ads:
+            try:
+                offers.append(OLXScraper.parse_state_ad(ad))
+            except Exception as e:
+                metrics.error('parse', e)
+                log.warning(f"Błąd podczas parsowania oferty: {e}")
+        return offers
+    
+    @staticmethod
+    def is_offer_url(url):
+        """Sprawdza, czy adres prowadzi do strony oferty OLX"""
+        parts = urlsplit(url or "")
+        return parts.netloc == 'www.olx.pl' and parts.path.startswith('/d/oferta/')
+    
+    @staticmethod
+    def description_text(description):
+        """Zamienia opis oferty zapisany w HTML na zwykły tekst"""
+        text = re.sub(r'<br\s*/?>', '\n', description or "", flags=re.IGNORECASE)
+        text = unescape(re.sub(r'<[^>]+>', '', text))
+        return re.sub(r'\n{3,}', '\n\n', text).strip()
+    
+    @staticmethod
+    def parse_offer_details(html):
+        """Wyciąga opis, czas dodania, sprzedającego i parametry ze strony oferty - ze stanu strony lub z HTML"""
+        state = OLXScraper.extract_state(html)
+        ad = ((state or {}).get('ad') or {}).get('ad') if isinstance(state, dict) else None
+        if isinstance(ad, dict):
+            created = ""
+            if ad.get('createdTime'):
                 try:
-                    # Poprawione pobieranie tytułu - szukamy różnych elementów
-                    title_element = offer.find('h6')
-                    if not title_element:
-                        title_element = offer.find('a').find('h6')
-                    if not title_element:
-                        title_element = offer.find('a').find('div', {'data-testid': 'listing-ad-title'})
-                    if not title_element:
-                        all_headings = offer.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
-                        if all_headings:
-                            title_element = all_headings[0]
-                            
-                    title = title_element.text.strip() if title_element else "Brak tytułu"
-                    
-                    url_element = offer.find('a')
-                    offer_url = url_element['href'] if url_element else ""
-                    if not offer_url.startswith('http'):
-                        offer_url = 'https://www.olx.pl' + offer_url
-                    
-                    price_element = offer.find('p', {'data-testid': 'ad-price'}) 
-                    price = OLXScraper.parse_price(price_element.text) if price_element else "Cena nie podana"
-                    
-                    img_element = offer.find('img')
-                    img_url = img_element['src'] if img_element and 'src' in img_element.attrs else ""
-                    
-                    # Dodanie informacji o wysyłce
-                    delivery_info = "Brak informacji"
-                    delivery_element = offer.find('span', {'data-testid': 'delivery-icon'})
-                    if delivery_element:
-                        delivery_info = "Wysyłka OLX"
-                    
-                    # Poprawiona linia z błędem:
-                    offer_id = re.search(r'ID(.+?)', offer_url)
-                    if not offer_id:
-                        offer_id = offer_url  # Jeśli nie możemy wyciągnąć ID, używamy całego URL jako ID
-                    else:
-                        offer_id = offer_id.group(1)
-                    
-                    location_element = offer.find('p', {'data-testid': 'location-date'})
-                    location_text = location_element.text.strip() if location_element else "Brak lokalizacji"
-                    
-                    offers.append({
-                        'id': offer_id,
-                        'title': title,
-                        'price': price,
-                        'url': offer_url,
-                        'img_url': img_url,
-                        'delivery': delivery_info,
-                        'location': location_text
-                    })
-                except Exception as e:
-                    print(f"Błąd podczas parsowania oferty: {e}")
-            
+                    created = datetime.fromisoformat(ad['createdTime']).strftime('%d.%m.%Y %H:%M')
+                except ValueError:
+                    pass
+            user = ad.get('user') or {}
+            seller_since = ""
+            if user.get('created'):
+                try:
+                    seller_since = datetime.fromisoformat(user['created']).strftime('%m.%Y')
+                except ValueError:
+                    pass
+            location_data = ad.get('location') or {}
+            return {
+                'description': OLXScraper.description_text(ad.get('description')),
+                'created': created,
+                'seller': (user.get('name') or "").strip(),
+                'seller_since': seller_since,
+                'params': [(param.get('name'), param.get('value')) for param in ad.get('params') or [] if param.get('name') and param.get('value')],
+                'location': ", ".join(part for part in (location_data.get('cityName'), location_data.get('regionName')) if part)
+            }
+        
+        soup = BeautifulSoup(html, 'html.parser')
+        def text(*selectors):
+            for attrs in selectors:
+                element = soup.find(attrs=attrs)
+                if element:
+                    return element.get_text('\n', strip=True)
+            return ""
+        params = []
+        container = soup.find(attrs={'data-testid': 'ad-parameters-container'})
+        for item in container.find_all('p') if container else []:
+            name, _, value = item.get_text(strip=True).partition(':')
+            if value:
+                params.append((name.strip(), value.strip()))
+        description = text({'data-cy': 'ad_description'}, {'data-testid': 'ad_description'})
+        return {
+            'description': re.sub(r'^Opis\s*', '', description),
+            'created': text({'data-cy': 'ad-posted-at'}, {'data-testid': 'ad-posted-at'}),
+            'seller': text({'data-testid': 'user-profile-user-name'}),
+            'seller_since': text({'data-testid': 'member-since'}),
+            'params': params,
+            'location': ""
+        }
+    
+    @staticmethod
+    def parse_offers(html, backend=None, limit=MAX_CARDS):
+        """Wyciąga oferty z kodu HTML strony wyników OLX"""
+        # Najpierw dane ze stanu strony - parsowanie kart HTML tylko gdy go brakuje
+        offers = OLXScraper.parse_state_offers(html, limit)
+        if offers is not None:
             return offers
-        except Exception as e:
-            print(f"Błąd podczas wyszukiwania: {e}")
+        return OLXScraper.parse_card_offers(html, backend, limit)
+    
+    @staticmethod
+    def parse_card_offers(html, backend=None, limit=MAX_CARDS):
+        """Wyciąga oferty z kart HTML strony wyników wybranym parserem"""
+        offers = []
+        for offer in OLXScraper.find_cards(html, backend, limit):
+            try:
+                offers.append(OLXScraper.parse_card(offer))
+            except Exception as e:
+                metrics.error('parse', e)
+                log.warning(f"Błąd podczas parsowania oferty: {e}")
+        
+        return offers
+
+class ThrottledError(Exception):
+    """OLX odrzucił zapytanie (429/403) lub zwrócił stronę blokady"""
+    
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class CircuitOpenError(Exception):
+    """Pobieranie jest wstrzymane po wykryciu blokady"""
+
+class TokenBucket:
+    """Limiter zapytań typu token bucket - średnio rate zapytań na sekundę, chwilowo do capacity naraz"""
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+    
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    async def acquire(self):
+        """Czeka, aż będzie dostępny żeton, i go zużywa"""
+        while True:
+            self.refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class CircuitBreaker:
+    """Wstrzymuje pobieranie po serii zablokowanych zapytań - po przerwie przepuszcza jedno zapytanie próbne"""
+    
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.trips = 0
+        self.opened_until = 0.0
+        self.probing = False
+    
+    @property
+    def is_open(self):
+        return self.probing or time.monotonic() < self.opened_until
+    
+    def allow(self):
+        if time.monotonic() < self.opened_until or self.probing:
+            return False
+        if self.trips:
+            # Pierwsze zapytanie po przerwie sprawdza, czy blokada minęła
+            self.probing = True
+        return True
+    
+    def abort(self):
+        """Zapytanie próbne nie doszło do skutku z innego powodu niż blokada - kolejne znów sprawdzi"""
+        self.probing = False
+    
+    def success(self):
+        self.failures = 0
+        self.trips = 0
+        self.probing = False
+    
+    def failure(self):
+        self.failures += 1
+        if self.probing or self.failures >= self.threshold:
+            cooldown = self.cooldown * 2 ** min(self.trips, 4)
+            self.opened_until = time.monotonic() + cooldown
+            self.trips += 1
+            self.failures = 0
+            self.probing = False
+            log.warning(f"Wykryto blokadę OLX - wstrzymano pobieranie na {cooldown:.0f} s")
+    
+    def hold(self, seconds, reason="Inny proces wykrył blokadę OLX"):
+        """Wstrzymuje pobieranie na podany czas (blokada wykryta przez inny proces, długi Retry-After) - po przerwie pierwsze zapytanie jest próbne"""
+        # Tolerancja na przeliczenie między zegarami - własna blokada wraca z bazy jako ten sam termin
+        if time.monotonic() + seconds > self.opened_until + 1:
+            self.opened_until = time.monotonic() + seconds
+            self.trips = max(self.trips, 1)
+            log.warning(f"{reason} - wstrzymano pobieranie na {seconds:.0f} s")
+    
+    def blocked_until(self):
+        """Koniec wstrzymania pobierania jako czas zegara systemowego (0, gdy pobieranie działa) - do wymiany między procesami"""
+        remaining = self.opened_until - time.monotonic()
+        return time.time() + remaining if remaining > 0 else 0.0
+
+class CachedSearch:
+    """Walidatory HTTP, odcisk listy kart i ostatnie wyniki wyszukiwania
+    
+    Pozwalają na zapytania warunkowe, a gdy OLX ich nie obsługuje - na pominięcie parsowania
+    niezmienionej strony i ponowne użycie już sparsowanych ofert.
+    """
+    
+    def __init__(self, etag, last_modified, offers, fingerprint=None, parsed=None):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.offers = offers
+        self.fingerprint = fingerprint  # Skrót uporządkowanej listy adresów kart z pierwszej strony
+        self.parsed = parsed or {}  # Adres karty -> oferta sparsowana z pierwszej strony
+
+def parse_records(body, limit):
+    """Parsuje stronę wyników w procesie roboczym - zwraca oferty jako krotki pól OFFER_FIELDS i błędy parsowania"""
+    metrics.counters.clear()
+    # OLX wysyła strony wyników w UTF-8
+    offers = OLXScraper.parse_offers(body.decode('utf-8', errors='replace'), limit=limit)
+    return [tuple(offer.get(field) for field in OLXScraper.OFFER_FIELDS) for offer in offers], metrics.errors()
+
+def parse_details_record(body):
+    """Parsuje stronę oferty w procesie roboczym - zwraca szczegóły oferty i błędy parsowania"""
+    metrics.counters.clear()
+    return OLXScraper.parse_offer_details(body.decode('utf-8', errors='replace')), metrics.errors()
+
+class ParsePool:
+    """Pula procesów parsujących strony wyników - pętla zdarzeń zajmuje się tylko siecią i wysyłką
+    
+    Liczba stron przekazanych naraz do parsowania jest ograniczona do PARSE_QUEUE_SIZE,
+    aby przy wolnym parsowaniu pobrane strony nie gromadziły się w pamięci.
+    """
+    
+    def __init__(self, workers=PARSE_WORKERS, queue_size=PARSE_QUEUE_SIZE):
+        self.workers = workers
+        self.slots = asyncio.Semaphore(queue_size)
+        self.executor = None
+    
+    def start(self):
+        if self.workers and self.executor is None:
+            # spawn zamiast fork - rozwidlenie procesu z działającymi wątkami (logi, zapis do SQLite) jest niebezpieczne
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+    
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+    
+    def restart(self, error):
+        metrics.error('parse', error)
+        log.error("Proces parsujący przestał działać - uruchamiam pulę od nowa")
+        self.executor = None
+        self.start()
+    
+    async def parse(self, body, limit=MAX_CARDS):
+        """Zwraca oferty ze strony wyników - w procesie roboczym albo, bez puli, w pętli zdarzeń"""
+        async with self.slots:
+            if self.executor is None:
+                return OLXScraper.parse_offers(body.decode('utf-8', errors='replace'), limit=limit)
+            try:
+                records, errors = await asyncio.get_running_loop().run_in_executor(self.executor, parse_records, body, limit)
+            except BrokenProcessPool as e:
+                self.restart(e)
+                return OLXScraper.parse_offers(body.decode('utf-8', errors='replace'), limit=limit)
+        for (stage, error_type), count in errors:
+            metrics.inc('olx_monitor_errors_total', count, stage=stage, type=error_type)
+        return [dict(zip(OLXScraper.OFFER_FIELDS, record)) for record in records]
+    
+    async def parse_details(self, body):
+        """Zwraca szczegóły oferty ze strony oferty - w procesie roboczym albo, bez puli, w pętli zdarzeń"""
+        async with self.slots:
+            if self.executor is None:
+                return OLXScraper.parse_offer_details(body.decode('utf-8', errors='replace'))
+            try:
+                details, errors = await asyncio.get_running_loop().run_in_executor(self.executor, parse_details_record, body)
+            except BrokenProcessPool as e:
+                self.restart(e)
+                return OLXScraper.parse_offer_details(body.decode('utf-8', errors='replace'))
+        for (stage, error_type), count in errors:
+            metrics.inc('olx_monitor_errors_total', count, stage=stage, type=error_type)
+        return details
+
+class FetchEngine:
+    """Asynchroniczny silnik pobierania wyników OLX ze wspólną sesją HTTP i limitem równoległych zapytań"""
+    
+    def __init__(self, concurrency=MAX_CONCURRENT_REQUESTS, timeout=REQUEST_TIMEOUT):
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.session = None
+        self.cache = {}  # Sygnatura zapytania -> CachedSearch
+        self.not_modified = 0  # Liczba odpowiedzi 304 (strona bez zmian, bez parsowania)
+        self.unchanged = 0  # Strony z niezmienioną listą kart (bez parsowania)
+        self.reused = 0  # Oferty wzięte z poprzedniego parsowania zamiast parsowane ponownie
+        self.limiter = TokenBucket(OLX_REQUESTS_PER_SECOND, OLX_BURST)
+        self.breaker = CircuitBreaker()
+        self.throttled = 0  # Zapytania odrzucone przez OLX
+        self.retried = 0  # Ponowione zapytania
+        self.dropped = 0  # Zapytania porzucone (wyczerpane ponowienia lub wstrzymane pobieranie)
+        self.in_flight = 0  # Zapytania w toku
+        self.parser = ParsePool()
+    
+    async def start(self):
+        """Otwiera wspólną sesję HTTP z pulą połączeń keep-alive"""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, ttl_dns_cache=300, keepalive_timeout=KEEPALIVE_TIMEOUT)
+            headers = dict(OLXScraper.HEADERS, **{'Accept-Encoding': ACCEPT_ENCODING})
+            self.session = aiohttp.ClientSession(headers=headers, timeout=self.timeout, connector=connector)
+        self.parser.start()
+    
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        self.parser.close()
+    
+    async def __aenter__(self):
+        await self.start()
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.close()
+    
+    def prune(self, signatures):
+        """Usuwa z pamięci walidatory zapytań, których nikt już nie monitoruje"""
+        for signature in set(self.cache) - set(signatures):
+            del self.cache[signature]
+    
+    async def fetch_once(self, url, params, headers=None):
+        """Wykonuje jedno zapytanie - czeka na żeton limitera i wolne miejsce w limicie równoległych zapytań"""
+        await self.limiter.acquire()
+        async with self.semaphore:
+            self.in_flight += 1
+            try:
+                with metrics.timer('olx_monitor_stage_seconds', stage='fetch'):
+                    return await self.get(url, params, headers)
+            finally:
+                self.in_flight -= 1
+    
+    async def get(self, url, params, headers):
+        """Zapytanie GET do OLX - zwraca (status, surowa treść, nagłówki) albo zgłasza ThrottledError przy blokadzie"""
+        async with self.session.get(url, params=params, headers=headers) as response:
+            metrics.inc('olx_monitor_http_responses_total', status=response.status)
+            if response.status in (403, 429):
+                retry_after = response.headers.get('Retry-After')
+                raise ThrottledError(
+                    f"OLX odrzucił zapytanie ({response.status})",
+                    float(retry_after) if retry_after and retry_after.isdigit() else None
+                )
+            if response.status == 304:
+                return response.status, None, response.headers
+            response.raise_for_status()
+            body = await response.read()
+            if OLXScraper.is_block_page(body):
+                raise ThrottledError("OLX zwrócił stronę blokady")
+            return response.status, body, response.headers
+    
+    async def fetch(self, url, params, headers=None):
+        """Pobiera stronę wyników, ponawiając odrzucone zapytania z wykładniczym opóźnieniem i losowym rozrzutem"""
+        for attempt in range(MAX_RETRIES + 1):
+            if not self.breaker.allow():
+                self.dropped += 1
+                raise CircuitOpenError("Pobieranie wstrzymane po wykryciu blokady OLX")
+            try:
+                result = await self.fetch_once(url, params, headers)
+            except ThrottledError as e:
+                self.throttled += 1
+                self.breaker.failure()
+                if e.retry_after and e.retry_after > BACKOFF_MAX:
+                    # Tak długiego Retry-After nie przeczekujemy w rundzie - wstrzymujemy całe pobieranie
+                    self.breaker.hold(e.retry_after, f"OLX poprosił o przerwę (Retry-After: {e.retry_after:.0f} s)")
+                if attempt == MAX_RETRIES or self.breaker.is_open:
+                    self.dropped += 1
+                    raise
+                delay = e.retry_after or min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+                self.retried += 1
+                await asyncio.sleep(delay)
+            except BaseException:
+                self.breaker.abort()
+                raise
+            else:
+                self.breaker.success()
+                return result
+    
+    async def parse(self, body, limit=MAX_CARDS):
+        with metrics.timer('olx_monitor_stage_seconds', stage='parse'):
+            return await self.parser.parse(body, limit)
+    
+    async def parse_listing(self, body, keys, known, limit=MAX_CARDS):
+        """Parsuje karty tylko do ostatniej nowej karty - oferty za nią bierze z poprzedniego parsowania strony"""
+        considered = keys if limit is None else keys[:limit]
+        if known and considered:
+            new_positions = [index for index, key in enumerate(considered) if key not in known]
+            needed = new_positions[-1] + 1 if new_positions else 0
+            offers = await self.parse(body, limit=needed) if needed else []
+            # Stan strony i karty muszą opisywać te same oferty w tej samej kolejności - inaczej pełne parsowanie
+            if len(offers) == needed and all(OLXScraper.offer_key(offer) == key for offer, key in zip(offers, considered)):
+                offers.extend(known[key] for key in considered[needed:])
+                self.reused += len(considered) - needed
+                return offers
+        return await self.parse(body, limit=limit)
+    
+    async def scan(self, url, params, signature=None, stop_ids=(), stop_created=None):
+        """Czyta wyniki od najnowszych aż do znacznika (watermark) ostatnio widzianych ofert
+        
+        Bez znacznika zwraca tylko MAX_CARDS najnowszych ofert. Jeśli znacznika nie ma wśród nich,
+        czyta całą stronę i kolejne strony wyników, maksymalnie MAX_SCAN_PAGES. Parametry zapytania
+        to słownik albo gotowy zakodowany napis (Monitor.query_string).
+        """
+        if not isinstance(params, str):
+            signature = signature or OLXScraper.request_signature(url, params)
+            params = urlencode(params)
+        signature = signature or f"{url}?{params}"
+        cached = self.cache.get(signature)
+        
+        headers = {}
+        if cached:
+            if cached.etag:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+        
+        status, body, response_headers = await self.fetch(url, params, headers)
+        if status == 304 and cached:
+            self.not_modified += 1
+            return cached.offers
+        
+        # Najpierw tani odcisk listy kart - niezmieniona lista oznacza te same wyniki co ostatnio
+        keys = OLXScraper.listing_keys(body)
+        fingerprint = hashlib.blake2b(b"\n".join(keys), digest_size=16).digest() if keys else None
+        if cached and fingerprint is not None and fingerprint == cached.fingerprint:
+            self.unchanged += 1
+            return cached.offers
+        
+        known = dict(cached.parsed) if cached else {}
+        offers = await self.parse_listing(body, keys, known)
+        known.update((OLXScraper.offer_key(offer), offer) for offer in offers)
+        if stop_ids and find_watermark(offers, stop_ids, stop_created) is None:
+            # Od ostatniego sprawdzenia pojawiło się więcej ofert niż MAX_CARDS - czytamy dalej
+            offers = await self.parse_listing(body, keys, known, limit=None)
+            known.update((OLXScraper.offer_key(offer), offer) for offer in offers)
+            page = 1
+            while True:
+                position = find_watermark(offers, stop_ids, stop_created)
+                if position is not None:
+                    # Starsze oferty za znacznikiem były już widziane
+                    del offers[position + 1:]
+                    break
+                if page >= MAX_SCAN_PAGES:
+                    break
+                page += 1
+                try:
+                    _, page_body, _ = await self.fetch(url, f"{params}&page={page}" if params else f"page={page}")
+                except (ThrottledError, CircuitOpenError, aiohttp.ClientError) as e:
+                    metrics.error('fetch', e)
+                    log.warning(f"Przerwano czytanie kolejnych stron wyników: {e}")
+                    break
+                page_offers = await self.parse(page_body, limit=None)
+                if not page_offers:
+                    break
+                offers.extend(page_offers)
+        
+        etag = response_headers.get('ETag')
+        last_modified = response_headers.get('Last-Modified')
+        if etag or last_modified or fingerprint is not None:
+            # Zapamiętujemy tylko oferty z kart, które wciąż są na pierwszej stronie
+            parsed = {key: known[key] for key in keys if key in known}
+            self.cache[signature] = CachedSearch(etag, last_modified, offers, fingerprint, parsed)
+        else:
+            self.cache.pop(signature, None)
+        return offers
+
+def find_watermark(offers, stop_ids, stop_created):
+    """Zwraca pozycję pierwszej już widzianej oferty ze znacznika lub None
+    
+    Oferty promowane są pomijane - wyświetlają się na górze niezależnie od daty dodania.
+    """
+    for index, offer in enumerate(offers):
+        if offer.get('promoted'):
+            continue
+        if offer['id'] in stop_ids:
+            return index
+        if stop_created and offer.get('created') and offer['created'] <= stop_created:
+            return index
+    return None
+
+def drop_stale_promoted(offers, watermark):
+    """Pomija oferty promowane dodane przed znacznikiem - wyróżnienie wciąż wraca na górę listy stare ogłoszenia
+    
+    Oferty promowane o nieznanym czasie dodania (karty HTML, znacznik bez czasu) zostają -
+    powtórzenia odrzuci zwykła deduplikacja po identyfikatorze oferty.
+    """
+    stop_created = watermark[1] if watermark is not None else None
+    return [offer for offer in offers if not offer.get('promoted')
+            or not stop_created or not offer.get('created') or offer['created'] > stop_created]
+
+def build_watermark(offers):
+    """Znacznik ostatnio widzianych ofert - identyfikatory i czas dodania najnowszych niepromowanych ofert"""
+    regular = [offer for offer in offers if not offer.get('promoted')]
+    if not regular:
+        return None
+    created = [offer['created'] for offer in regular if offer.get('created')]
+    return frozenset(offer['id'] for offer in regular[:WATERMARK_SIZE]), max(created) if created else None
+
+fetch_engine = FetchEngine()
+
+class DetailCache:
+    """Wspólna dla wszystkich użytkowników pamięć szczegółów ofert - LRU z czasem ważności wpisów
+    
+    Równoczesne prośby o tę samą ofertę czekają na jedno pobranie zamiast wysyłać własne zapytania.
+    """
+    
+    def __init__(self, size=DETAILS_CACHE_SIZE, ttl=DETAILS_TTL):
+        self.size = size
+        self.ttl = ttl
+        self.entries = {}  # Klucz -> (termin ważności, wartość) - od najdawniej używanego
+        self.loading = {}  # Klucz -> zadanie pobierające wartość
+    
+    async def get(self, key, load):
+        """Zwraca wartość z pamięci albo wynik load() - jedno wywołanie load() na klucz naraz"""
+        entry = self.entries.pop(key, None)
+        if entry is not None and entry[0] > time.monotonic():
+            self.entries[key] = entry
+            metrics.inc('olx_monitor_details_requests_total', source='cache')
+            return entry[1]
+        task = self.loading.get(key)
+        if task is None:
+            metrics.inc('olx_monitor_details_requests_total', source='fetch')
+            task = self.loading[key] = asyncio.create_task(load())
+            task.add_done_callback(lambda done: self.finish(key, done))
+        else:
+            metrics.inc('olx_monitor_details_requests_total', source='coalesced')
+        # Anulowanie jednej prośby (np. wygaśnięcie interakcji) nie przerywa pobierania dla pozostałych
+        return await asyncio.shield(task)
+    
+    def finish(self, key, task):
+        del self.loading[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        self.entries[key] = (time.monotonic() + self.ttl, task.result())
+        while len(self.entries) > self.size:
+            del self.entries[next(iter(self.entries))]
+
+offer_details = DetailCache()
+
+async def fetch_offer_details(url):
+    """Pobiera i parsuje stronę oferty przy pierwszej prośbie - kolejne są obsługiwane z DetailCache"""
+    path = urlsplit(url).path
+    
+    async def load():
+        await fetch_engine.start()
+        _, body, _ = await fetch_engine.fetch(OLX_BASE_URL + path, None)
+        with metrics.timer('olx_monitor_stage_seconds', stage='parse'):
+            return await fetch_engine.parser.parse_details(body)
+    
+    return await offer_details.get(path, load)
+
+class SeenStore:
+    """Trwały magazyn widzianych ofert w SQLite (tryb WAL) z usuwaniem najstarszych wpisów"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.reader = None
+        self.pending = set()  # Pary (user_id, offer_id) czekające na zapis w bazie
+        self.pending_times = {}
+    
+    def open(self):
+        if self.reader is not None:
+            return
+        connection = self.connect()
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS seen_offers (
+                user_id TEXT NOT NULL,
+                offer_id TEXT NOT NULL,
+                first_seen REAL NOT NULL,
+                PRIMARY KEY (user_id, offer_id)
+            ) WITHOUT ROWID
+        """)
+        connection.execute("CREATE INDEX IF NOT EXISTS seen_offers_first_seen ON seen_offers (first_seen)")
+        connection.commit()
+        connection.close()
+        # Odczyty na pętli zdarzeń, zapisy w osobnym wątku - WAL pozwala im działać równocześnie
+        self.reader = self.connect()
+    
+    def connect(self):
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+    
+    def close(self):
+        if self.reader is not None:
+            rows = self.take_pending()
+            try:
+                self.write_pending(rows)
+            except sqlite3.Error as e:
+                # Np. czyszczenie w osobnym wątku wciąż trzyma blokadę - reszta zamykania musi się wykonać
+                metrics.error('seen', e)
+                log.error(f"Nie udało się zapisać {len(rows)} widzianych ofert przy zamykaniu: {e}")
+            finally:
+                self.reader.close()
+                self.reader = None
+    
+    def filter_new(self, user_id, offer_ids):
+        """Zwraca identyfikatory ofert, których użytkownik jeszcze nie widział"""
+        candidates = [offer_id for offer_id in dict.fromkeys(offer_ids) if (user_id, offer_id) not in self.pending]
+        if not candidates:
             return []
+        placeholders = ",".join("?" * len(candidates))
+        seen = {row[0] for row in self.reader.execute(
+            f"SELECT offer_id FROM seen_offers WHERE user_id = ? AND offer_id IN ({placeholders})",
+            [user_id, *candidates]
+        )}
+        return [offer_id for offer_id in candidates if offer_id not in seen]
+    
+    def add(self, user_id, offer_ids):
+        """Oznacza oferty jako widziane - zapis trafia do bazy przy najbliższym flush()"""
+        now = time.time()
+        for offer_id in offer_ids:
+            self.pending.add((user_id, offer_id))
+            self.pending_times[(user_id, offer_id)] = now
+    
+    def take_pending(self):
+        rows = [(user_id, offer_id, first_seen) for (user_id, offer_id), first_seen in self.pending_times.items()]
+        self.pending_times = {}
+        return rows
+    
+    def write_pending(self, rows):
+        if not rows:
+            return
+        connection = self.connect()
+        try:
+            connection.executemany("INSERT OR IGNORE INTO seen_offers (user_id, offer_id, first_seen) VALUES (?, ?, ?)", rows)
+            connection.commit()
+        finally:
+            connection.close()
+    
+    async def flush(self):
+        """Zapisuje zebrane w cyklu oferty jednym wsadem, poza pętlą zdarzeń"""
+        rows = self.take_pending()
+        if not rows:
+            return
+        try:
+            await asyncio.to_thread(self.write_pending, rows)
+        except sqlite3.Error as e:
+            # Baza zablokowana (czyszczenie, inne procesy) - wpisy czekają na kolejną rundę
+            for user_id, offer_id, first_seen in rows:
+                self.pending_times.setdefault((user_id, offer_id), first_seen)
+            metrics.error('seen', e)
+            log.warning(f"Nie udało się zapisać {len(rows)} widzianych ofert - ponowienie w kolejnej rundzie: {e}")
+            return
+        # Wpisy znikają z pamięci dopiero po zapisaniu ich w bazie
+        self.pending.difference_update((user_id, offer_id) for user_id, offer_id, _ in rows)
+    
+    def keys(self):
+        """Zwraca wszystkie zapisane pary (user_id, offer_id) - do odbudowy filtra Blooma"""
+        connection = self.connect()
+        try:
+            yield from connection.execute("SELECT user_id, offer_id FROM seen_offers")
+        finally:
+            connection.close()
+    
+    def evict(self, ttl_days=SEEN_TTL_DAYS, max_entries=SEEN_MAX_ENTRIES):
+        """Usuwa oferty starsze niż ttl_days, a następnie najstarsze ponad limit max_entries"""
+        connection = self.connect()
+        try:
+            connection.execute("DELETE FROM seen_offers WHERE first_seen < ?", (time.time() - ttl_days * 86400,))
+            count = connection.execute("SELECT COUNT(*) FROM seen_offers").fetchone()[0]
+            if count > max_entries:
+                connection.execute(
+                    "DELETE FROM seen_offers WHERE (user_id, offer_id) IN "
+                    "(SELECT user_id, offer_id FROM seen_offers ORDER BY first_seen LIMIT ?)",
+                    (count - max_entries,)
+                )
+            connection.commit()
+            return connection.execute("SELECT COUNT(*) FROM seen_offers").fetchone()[0]
+        finally:
+            connection.close()
+
+seen_offers = SeenStore(SEEN_DB_PATH)
+
+MASK_64 = 0xFFFFFFFFFFFFFFFF
+
+def id_to_int(value):
+    """Zamienia identyfikator (oferty lub użytkownika) na liczbę mieszczącą się w 64 bitach ze znakiem"""
+    if value.isdigit() and len(value) <= 18:
+        return int(value)
+    # Pozostałe identyfikatory (slugi OLX, w których liczy się wielkość liter, cały URL) - skrót BLAKE2b
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'little') >> 1
+
+def mix_ids(scope, key):
+    """Miesza dwie liczby w jeden 64-bitowy skrót (finalizator splitmix64)"""
+    x = (key ^ (scope * 0x9E3779B97F4A7C15)) & MASK_64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK_64
+    return x ^ (x >> 31)
+
+class BloomFilter:
+    """Filtr Blooma na tablicy bajtów - pozwala szybko stwierdzić, że oferty na pewno nie widziano"""
+    __slots__ = ('bits', 'size', 'hashes', 'count')
+    
+    def __init__(self, capacity, error_rate=0.01):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+    
+    def add(self, digest):
+        step = (digest >> 32) | 1
+        for i in range(self.hashes):
+            position = (digest + i * step) % self.size
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+    
+    def __contains__(self, digest):
+        step = (digest >> 32) | 1
+        for i in range(self.hashes):
+            position = (digest + i * step) % self.size
+            if not self.bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+class DedupRing:
+    """Bufor cykliczny ostatnich identyfikatorów ofert jednego monitorowania (64-bitowe liczby w tablicy)"""
+    __slots__ = ('ids', 'position')
+    
+    def __init__(self, size):
+        self.ids = array('q', bytes(8 * size))
+        self.position = 0
+    
+    def push(self, key):
+        self.ids[self.position] = key
+        self.position = (self.position + 1) % len(self.ids)
+
+class DedupIndex:
+    """Kompaktowy indeks widzianych ofert przed SeenStore: filtr Blooma + bufory cykliczne monitorowań
+    
+    Brak w filtrze Blooma oznacza nową ofertę bez zaglądania do bazy. Trafienie w filtrze jest
+    potwierdzane w buforze monitorowania, a dopiero gdy tam go nie ma - w SQLite.
+    """
+    
+    def __init__(self, store, capacity=BLOOM_CAPACITY, ring_size=DEDUP_RING_SIZE):
+        self.store = store
+        self.capacity = capacity
+        self.ring_size = ring_size
+        self.bloom = BloomFilter(capacity)
+        self.rings = {}  # (user_id, klucz monitorowania) -> DedupRing
+        self.ready = False  # Do czasu wczytania filtra z bazy każde trafienie sprawdzamy w SQLite
+        self.untrusted = set()  # Monitorowania przejęte od innego procesu - ich oferty mogą nie być w naszym filtrze
+        self.rebuild_log = None
+    
+    def build_bloom(self):
+        """Buduje filtr Blooma ze wszystkich ofert zapisanych w bazie (wywoływane w osobnym wątku)"""
+        bloom = BloomFilter(self.capacity)
+        scopes = {}
+        for user_id, offer_id in self.store.keys():
+            scope = scopes.get(user_id)
+            if scope is None:
+                scope = scopes[user_id] = id_to_int(user_id)
+            bloom.add(mix_ids(scope, id_to_int(offer_id)))
+        return bloom
+    
+    async def rebuild(self):
+        """Wczytuje filtr Blooma z bazy - po starcie i po usunięciu starych ofert z bazy"""
+        # Oferty jeszcze niezapisane w bazie i dodane w trakcie odbudowy trafiają do nowego filtra osobno
+        self.rebuild_log = [mix_ids(id_to_int(user_id), id_to_int(offer_id)) for user_id, offer_id in self.store.pending]
+        untrusted, self.untrusted = self.untrusted, set()
+        try:
+            bloom = await asyncio.to_thread(self.build_bloom)
+            for digest in self.rebuild_log:
+                bloom.add(digest)
+            self.bloom = bloom
+            self.ready = True
+        except BaseException:
+            self.untrusted |= untrusted
+            raise
+        finally:
+            self.rebuild_log = None
+    
+    def prune(self, ring_keys):
+        """Usuwa bufory monitorowań, które już nie istnieją"""
+        for ring_key in set(self.rings) - set(ring_keys):
+            del self.rings[ring_key]
+    
+    def distrust(self, ring_keys):
+        """Oznacza monitorowania przejęte od innego procesu - do przebudowy filtra nowe oferty są potwierdzane w bazie"""
+        self.untrusted.update(ring_keys)
+    
+    def ring(self, user_id, monitor_key):
+        ring = self.rings.get((user_id, monitor_key))
+        if ring is None:
+            ring = self.rings[(user_id, monitor_key)] = DedupRing(self.ring_size)
+        return ring
+    
+    def filter_new(self, user_id, monitor_key, offer_ids):
+        """Zwraca identyfikatory ofert, których użytkownik jeszcze nie widział"""
+        scope = id_to_int(user_id)
+        ring = self.ring(user_id, monitor_key)
+        trusted = self.ready and (user_id, monitor_key) not in self.untrusted
+        new_ids = []
+        unsure = []
+        for offer_id in dict.fromkeys(offer_ids):
+            key = id_to_int(offer_id)
+            if trusted and mix_ids(scope, key) not in self.bloom:
+                new_ids.append(offer_id)
+            elif key in ring.ids:
+                continue
+            else:
+                unsure.append(offer_id)
+        
+        if unsure:
+            unseen = self.store.filter_new(user_id, unsure)
+            new_ids.extend(unseen)
+            # Potwierdzone w bazie oferty trafiają do bufora, aby kolejne sprawdzenie było tanie
+            unseen = set(unseen)
+            for offer_id in unsure:
+                if offer_id not in unseen:
+                    ring.push(id_to_int(offer_id))
+        return new_ids
+    
+    def add(self, user_id, monitor_key, offer_ids):
+        """Oznacza oferty jako widziane w indeksie i w bazie"""
+        scope = id_to_int(user_id)
+        ring = self.ring(user_id, monitor_key)
+        for offer_id in offer_ids:
+            key = id_to_int(offer_id)
+            digest = mix_ids(scope, key)
+            self.bloom.add(digest)
+            if self.rebuild_log is not None:
+                self.rebuild_log.append(digest)
+            ring.push(key)
+        self.store.add(user_id, offer_ids)
+    
+    def memory_report(self):
+        """Zwraca zużycie pamięci indeksu w bajtach i w przeliczeniu na jedną śledzoną ofertę"""
+        bloom_bytes = len(self.bloom.bits)
+        ring_bytes = sum(ring.ids.buffer_info()[1] * ring.ids.itemsize + sys.getsizeof(ring) for ring in self.rings.values())
+        total = bloom_bytes + ring_bytes + sys.getsizeof(self.rings)
+        tracked = self.bloom.count
+        return {
+            'bloom_bytes': bloom_bytes,
+            'ring_bytes': ring_bytes,
+            'total_bytes': total,
+            'tracked_offers': tracked,
+            'bytes_per_offer': total / tracked if tracked else 0.0
+        }
+
+dedup_index = DedupIndex(seen_offers)
+
+class Monitor(namedtuple('Monitor', 'id user_id query category min_price max_price delivery condition location channel_id sort_by '
+                                    'url query_string signature min_price_value max_price_value wanted_state')):
+    """Monitorowanie wyszukiwania - niezmienne, z planem zapytania i filtrami przygotowanymi raz przy utworzeniu
+    
+    Adres, zakodowane parametry i sygnatura zapytania nie są przeliczane w każdym cyklu,
+    a powtarzające się napisy (frazy, kategorie, lokalizacje) są współdzielone przez sys.intern.
+    """
+    __slots__ = ()
+    
+    # Pola podawane przez użytkownika i zapisywane w bazie - pozostałe są z nich wyliczane
+    CONFIG_FIELDS = ('query', 'category', 'min_price', 'max_price', 'delivery', 'condition', 'location', 'channel_id', 'sort_by')
+    
+    @classmethod
+    def create(cls, monitor_id, user_id, config):
+        """Tworzy monitorowanie z konfiguracji (formularz, komenda lub baza) i kompiluje jego zapytanie"""
+        config = {field: config.get(field) for field in cls.CONFIG_FIELDS}
+        config['sort_by'] = config['sort_by'] or 'newest'
+        config = {field: sys.intern(value) if isinstance(value, str) else value for field, value in config.items()}
+        url, params = OLXScraper.config_request(config)
+        return cls(
+            id=monitor_id,
+            user_id=sys.intern(user_id),
+            url=sys.intern(url),
+            query_string=sys.intern(urlencode(params)),
+            signature=sys.intern(OLXScraper.request_signature(url, params)),
+            min_price_value=OLXScraper.parse_price_value(config['min_price']),
+            max_price_value=OLXScraper.parse_price_value(config['max_price']),
+            wanted_state=OLXScraper.CONDITION_MAP.get(config['condition']),
+            **config
+        )
+    
+    def config(self):
+        """Konfiguracja do zapisu w bazie - plan zapytania jest odtwarzany przy wczytaniu"""
+        return {field: getattr(self, field) for field in self.CONFIG_FIELDS}
+
+class MonitorRegistry:
+    """Trwały rejestr monitorowań w SQLite - zmiany są zapisywane w tle, wsadami"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.pending = []  # Zmiany czekające na zapis: (akcja, id, user_id, konfiguracja)
+        self.changed = asyncio.Event()
+        self.closing = False
+        self.writer = None
+        self.next_id = 1
+    
+    def connect(self):
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+    
+    @staticmethod
+    def create_table(connection):
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS monitors (
+                id INTEGER PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                config TEXT NOT NULL
+            )
+        """)
+        connection.commit()
+    
+    def load(self):
+        """Wczytuje wszystkie monitorowania jednym zapytaniem i zwraca je pogrupowane po użytkownikach"""
+        connection = self.connect()
+        try:
+            self.create_table(connection)
+            configs = {}
+            for monitor_id, user_id, config_json in connection.execute("SELECT id, user_id, config FROM monitors ORDER BY id"):
+                configs.setdefault(user_id, []).append(Monitor.create(monitor_id, user_id, json.loads(config_json)))
+                self.next_id = max(self.next_id, monitor_id + 1)
+        finally:
+            connection.close()
+        return configs
+    
+    def revision(self):
+        """Skrót stanu tabeli monitorowań - procesy sprawdzające wczytują je ponownie tylko po zmianie"""
+        connection = self.connect()
+        try:
+            self.create_table(connection)
+            return connection.execute("SELECT COUNT(*), MAX(id) FROM monitors").fetchone()
+        finally:
+            connection.close()
+    
+    def start(self):
+        if self.writer is None or self.writer.done():
+            self.writer = asyncio.create_task(self.write_behind())
+    
+    def add(self, user_id, config):
+        """Tworzy monitorowanie z nowym identyfikatorem i kolejkuje jego zapis - nie blokuje obsługi komendy"""
+        monitor = Monitor.create(self.next_id, user_id, config)
+        self.next_id += 1
+        self.pending.append(('add', monitor.id, user_id, json.dumps(monitor.config(), ensure_ascii=False)))
+        self.changed.set()
+        return monitor
+    
+    def remove(self, monitor):
+        """Kolejkuje usunięcie monitorowania z bazy"""
+        self.pending.append(('remove', monitor.id, None, None))
+        self.changed.set()
+    
+    def write_batch(self, batch):
+        connection = self.connect()
+        try:
+            with connection:
+                for action, monitor_id, user_id, config_json in batch:
+                    if action == 'add':
+                        connection.execute("INSERT OR REPLACE INTO monitors (id, user_id, config) VALUES (?, ?, ?)", (monitor_id, user_id, config_json))
+                    else:
+                        connection.execute("DELETE FROM monitors WHERE id = ?", (monitor_id,))
+        finally:
+            connection.close()
+    
+    async def write_behind(self):
+        """Czeka na zmiany, zbiera je przez WRITE_BEHIND_DELAY i zapisuje jedną transakcją w osobnym wątku"""
+        while True:
+            await self.changed.wait()
+            if not self.closing:
+                await asyncio.sleep(WRITE_BEHIND_DELAY)
+            self.changed.clear()
+            batch, self.pending = self.pending, []
+            if batch:
+                try:
+                    await asyncio.to_thread(self.write_batch, batch)
+                except Exception as e:
+                    metrics.error('registry', e)
+                    log.error(f"Błąd podczas zapisu monitorowań: {e}")
+            if self.closing:
+                return
+    
+    async def close(self):
+        """Zapisuje zmiany, które jeszcze czekają w kolejce, i kończy zapis w tle"""
+        if self.writer is not None and not self.writer.done():
+            self.closing = True
+            self.changed.set()
+            await self.writer
+        elif self.pending:
+            batch, self.pending = self.pending, []
+            self.write_batch(batch)
+
+registry = MonitorRegistry(MONITOR_DB_PATH)
+
+class EventQueue:
+    """Kolejka zdarzeń w SQLite między procesami sprawdzającymi (--scraper) a botem połączonym z Discordem
+    
+    Procesy sprawdzające dopisują nowe oferty i co HEARTBEAT_INTERVAL zgłaszają, że działają.
+    Bot jest jedynym odbiorcą - zdejmuje zdarzenia wsadami i kolejkuje je do wysłania.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.connection = None
+    
+    def connect(self, timeout=30):
+        connection = sqlite3.connect(self.path, timeout=timeout, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+    
+    def open(self):
+        if self.connection is not None:
+            return
+        self.connection = self.connect()
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel_id INTEGER NOT NULL,
+                config TEXT NOT NULL,
+                offer TEXT NOT NULL
+            )
+        """)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS scrapers (
+                worker_id TEXT PRIMARY KEY,
+                heartbeat REAL NOT NULL,
+                monitors INTEGER NOT NULL
+            )
+        """)
+        # Wspólne wstrzymanie pobierania - blokada wykryta przez jeden proces wstrzymuje wszystkie
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS breaker (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                blocked_until REAL NOT NULL
+            )
+        """)
+        self.connection.execute("INSERT OR IGNORE INTO breaker (id, blocked_until) VALUES (1, 0)")
+        self.connection.commit()
+    
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+    
+    def publish(self, events):
+        """Dopisuje zdarzenia (channel_id, oferta, monitorowanie) jedną transakcją"""
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO events (channel_id, config, offer) VALUES (?, ?, ?)",
+                [(channel_id, json.dumps(dict(monitor.config(), id=monitor.id, user_id=monitor.user_id), ensure_ascii=False), json.dumps(offer, ensure_ascii=False))
+                 for channel_id, offer, monitor in events]
+            )
+    
+    def take(self, limit=EVENT_BATCH_SIZE):
+        """Zdejmuje z kolejki najstarsze zdarzenia - zwraca listę (channel_id, oferta, monitorowanie)"""
+        with self.connection:
+            rows = self.connection.execute("SELECT id, channel_id, config, offer FROM events ORDER BY id LIMIT ?", (limit,)).fetchall()
+            if rows:
+                self.connection.execute("DELETE FROM events WHERE id <= ?", (rows[-1][0],))
+        events = []
+        for _, channel_id, config_json, offer_json in rows:
+            config = json.loads(config_json)
+            events.append((channel_id, json.loads(offer_json), Monitor.create(config['id'], config['user_id'], config)))
+        return events
+    
+    def heartbeat(self, worker_id, monitors, blocked_until=0.0):
+        """Zgłasza działanie procesu sprawdzającego i jego wstrzymanie pobierania
+        
+        Zwraca identyfikatory wszystkich działających procesów i wspólny koniec wstrzymania pobierania (czas systemowy).
+        Używa osobnego połączenia - zgłoszenia idą w tle, równolegle z publikowaniem ofert z rundy.
+        """
+        now = time.time()
+        connection = self.connect(timeout=HEARTBEAT_INTERVAL)
+        try:
+            with connection:
+                connection.execute("INSERT OR REPLACE INTO scrapers (worker_id, heartbeat, monitors) VALUES (?, ?, ?)", (worker_id, now, monitors))
+                connection.execute("DELETE FROM scrapers WHERE heartbeat < ?", (now - HEARTBEAT_TIMEOUT,))
+                connection.execute("UPDATE breaker SET blocked_until = MAX(blocked_until, ?) WHERE id = 1", (blocked_until,))
+            workers = sorted(row[0] for row in connection.execute("SELECT worker_id FROM scrapers"))
+            return workers, connection.execute("SELECT blocked_until FROM breaker WHERE id = 1").fetchone()[0]
+        finally:
+            connection.close()
+    
+    def leave(self, worker_id):
+        """Wyrejestrowuje zatrzymywany proces - pozostałe przejmują jego monitorowania bez czekania na HEARTBEAT_TIMEOUT"""
+        connection = self.connect()
+        try:
+            with connection:
+                connection.execute("DELETE FROM scrapers WHERE worker_id = ?", (worker_id,))
+        finally:
+            connection.close()
+
+event_queue = EventQueue(EVENT_DB_PATH)
+
+class EventPublisher:
+    """Zamiennik DeliveryQueue w procesie sprawdzającym - nowe oferty trafiają do kolejki zdarzeń zamiast na Discorda"""
+    
+    def __init__(self, events):
+        self.events = events
+        self.pending = []
+    
+    def has_channel(self, channel_id):
+        # Kanały zna tylko bot połączony z Discordem - sprawdza je przy wysyłce
+        return True
+    
+    def depth(self):
+        return len(self.pending)
+    
+    def enqueue(self, channel_id, offer, monitor):
+        self.pending.append((channel_id, offer, monitor))
+    
+    async def flush(self):
+        """Publikuje nowe oferty z rundy jedną transakcją"""
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        try:
+            await asyncio.to_thread(self.events.publish, batch)
+        except sqlite3.Error as e:
+            # Oferty wracają na początek kolejki i zostaną opublikowane w kolejnej rundzie
+            self.pending[:0] = batch
+            metrics.error('events', e)
+            log.warning(f"Nie udało się opublikować {len(batch)} ofert - ponowienie w kolejnej rundzie: {e}")
+    
+    def close(self):
+        """Publikuje oferty, których nie zdążyła opublikować przerwana runda"""
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        try:
+            self.events.publish(batch)
+        except sqlite3.Error as e:
+            metrics.error('events', e)
+            log.error(f"Nie udało się opublikować {len(batch)} ofert przy zamykaniu: {e}")
+
+class MonitorSchedule:
+    """Stan odpytywania jednego monitorowania"""
+    __slots__ = ('interval', 'due', 'rate', 'checked', 'watermark', 'primed')
+    
+    def __init__(self, interval, due, primed=False):
+        self.interval = interval
+        self.due = due  # None w trakcie sprawdzania
+        self.rate = None  # Średnia krocząca liczby nowych ofert na sekundę (None przed pierwszym pomiarem)
+        self.checked = None  # Czas ostatniego udanego sprawdzenia - początek okna pomiaru tempa
+        self.watermark = None  # (identyfikatory, czas dodania) ostatnio widzianych ofert
+        self.primed = primed  # False do pierwszego udanego sprawdzenia - zostaje ono wykonane po cichu
+
+class PollScheduler:
+    """Kolejka priorytetowa monitorowań według terminu kolejnego sprawdzenia
+    
+    Odstęp każdego monitorowania wynika ze średniej kroczącej tempa nowych ofert - sprawdzamy
+    mniej więcej wtedy, gdy powinna pojawić się jedna nowa oferta, zawsze w granicach MIN/MAX_POLL_INTERVAL.
+    Pierwsze sprawdzenie nowego lub wczytanego po restarcie monitorowania tylko zapamiętuje
+    obecne oferty - po starcie takie sprawdzenia są rozłożone na prime_ramp sekund.
+    """
+    
+    def __init__(self, initial_interval=INTERVAL * 60, min_interval=MIN_POLL_INTERVAL, max_interval=MAX_POLL_INTERVAL, prime_ramp=PRIME_RAMP_SECONDS):
+        self.initial_interval = initial_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.prime_ramp = prime_ramp
+        self.started = False  # Po pierwszej synchronizacji nowe monitorowania są sprawdzane od razu
+        self.heap = []  # (termin, numer, id monitorowania) - nieaktualne wpisy są pomijane przy zdejmowaniu
+        self.schedules = {}
+        self.counter = itertools.count()
+    
+    def jittered(self, interval):
+        return interval * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+    
+    def push(self, monitor_id, due):
+        self.schedules[monitor_id].due = due
+        heapq.heappush(self.heap, (due, next(self.counter), monitor_id))
+    
+    def sync(self, monitor_ids, now):
+        """Dodaje nowe monitorowania do wstępnego sprawdzenia i usuwa nieistniejące
+        
+        Monitorowania wczytane przy starcie dostają termin rozrzucony w prime_ramp sekundach,
+        a dodane później przez użytkowników są sprawdzane w najbliższej rundzie.
+        """
+        for monitor_id in monitor_ids:
+            if monitor_id not in self.schedules:
+                self.schedules[monitor_id] = MonitorSchedule(self.initial_interval, None)
+                self.push(monitor_id, now + random.uniform(0, self.prime_ramp) if not self.started else now)
+        for monitor_id in set(self.schedules) - set(monitor_ids):
+            del self.schedules[monitor_id]
+        self.started = True
+    
+    def adopt(self, monitor_ids, now):
+        """Dodaje monitorowania przejęte od innego procesu - poprzedni właściciel już je sprawdzał, więc nie są wyciszane"""
+        for monitor_id in monitor_ids:
+            if monitor_id not in self.schedules:
+                self.schedules[monitor_id] = MonitorSchedule(self.initial_interval, None, primed=True)
+                self.push(monitor_id, now + random.uniform(0, self.initial_interval))
+    
+    def priming(self):
+        """Zwraca liczbę monitorowań czekających na wstępne sprawdzenie"""
+        return sum(1 for schedule in self.schedules.values() if not schedule.primed)
+    
+    def pop_due(self, now):
+        """Zdejmuje z kolejki wszystkie monitorowania, których termin minął"""
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            entry_due, _, monitor_id = heapq.heappop(self.heap)
+            schedule = self.schedules.get(monitor_id)
+            if schedule is None or schedule.due != entry_due:
+                continue
+            schedule.due = None
+            due.append(monitor_id)
+        return due
+    
+    def next_due(self):
+        return self.heap[0][0] if self.heap else None
+    
+    def record(self, monitor_id, new_count, now, baseline=False):
+        """Aktualizuje tempo nowych ofert, wylicza z niego odstęp i planuje kolejne sprawdzenie
+        
+        new_count=None oznacza błąd pobierania - odstęp się nie zmienia. Przy baseline=True (wstępne
+        sprawdzenie) zaczyna się tylko okno pomiaru tempa.
+        """
+        schedule = self.schedules.get(monitor_id)
+        if schedule is None:
+            return
+        if new_count is not None and not baseline:
+            if schedule.checked is not None:
+                observed = new_count / max(1.0, now - schedule.checked)
+                schedule.rate = observed if schedule.rate is None else 0.7 * schedule.rate + 0.3 * observed
+                # Odstęp, w którym przy obecnym tempie pojawia się średnio jedna nowa oferta
+                schedule.interval = 1 / schedule.rate if schedule.rate > 0 else self.max_interval
+                schedule.interval = min(self.max_interval, max(self.min_interval, schedule.interval))
+            schedule.checked = now
+        elif baseline:
+            schedule.checked = now
+        self.push(monitor_id, now + self.jittered(schedule.interval))
+
+scheduler = PollScheduler()
+
+def describe_poll_interval():
+    """Opis zakresu odstępów sprawdzania dla użytkownika, np. od 30 s do 15 min"""
+    def duration(seconds):
+        return f"{seconds} s" if seconds < 60 or seconds % 60 else f"{seconds // 60} min"
+    return f"od {duration(MIN_POLL_INTERVAL)} do {duration(MAX_POLL_INTERVAL)}"
+
+class SearchPlan:
+    """Jedno unikalne zapytanie do OLX wraz z monitorowaniami, które na nie czekają"""
+    
+    def __init__(self, url, query_string, signature):
+        self.url = url
+        self.query_string = query_string
+        self.signature = signature
+        self.subscribers = []  # Monitorowania korzystające z tego zapytania
+
+def plan_searches(monitors):
+    """Grupuje monitorowania według sygnatury zapytania - każde unikalne wyszukiwanie jest pobierane raz na cykl"""
+    plans = {}
+    for monitor in monitors:
+        plan = plans.get(monitor.signature)
+        if plan is None:
+            plan = plans[monitor.signature] = SearchPlan(monitor.url, monitor.query_string, monitor.signature)
+        plan.subscribers.append(monitor)
+    return plans
+
 
 @bot.event
 async def on_ready():
-    print(f'Bot zalogowany jako {bot.user.name}')
-    check_offers.start()
-    clear_old_offers.start()  # Uruchamiamy zadanie czyszczenia po zalogowaniu bota
+    log.info(f'Bot zalogowany jako {bot.user.name}')
+    if SCRAPER_MODE != 'external':
+        await fetch_engine.start()
+        seen_offers.open()
+    await metrics.start_server()
+    # on_ready jest wywoływane ponownie po każdym wznowieniu połączenia
+    if SCRAPER_MODE == 'external':
+        # Oferty sprawdzają procesy --scraper - bot tylko obsługuje komendy i wysyła powiadomienia
+        event_queue.open()
+        if SCRAPER_WORKERS and not supervise_scrapers.is_running():
+            supervise_scrapers.start()
+        if not consume_events.is_running():
+            consume_events.start()
+        return
+    if not check_offers.is_running():
+        check_offers.start()
+    if not clear_old_offers.is_running():
+        clear_old_offers.start()  # Uruchamiamy zadanie czyszczenia po zalogowaniu bota
 
 @bot.event
 async def on_interaction(interaction):
@@ -165,15 +1948,23 @@ async def on_interaction(interaction):
                 if str(interaction.user.id) == user_id:
                     if user_id in user_configs and 0 <= monitor_index < len(user_configs[user_id]):
                         removed = user_configs[user_id].pop(monitor_index)
-                        await interaction.response.send_message(f"✅ Usunięto monitorowanie dla: **{removed['query']}**", ephemeral=True)
+                        registry.remove(removed)
+                        await interaction.response.send_message(f"✅ Usunięto monitorowanie dla: **{removed.query}**", ephemeral=True)
                     else:
                         await interaction.response.send_message("❌ Nie znaleziono tego monitorowania.", ephemeral=True)
                 else:
                     await interaction.response.send_message("❌ Nie masz uprawnień do usunięcia tego monitorowania.", ephemeral=True)
             except Exception as e:
-                print(f"Błąd podczas usuwania monitorowania: {e}")
+                log.error(f"Błąd podczas usuwania monitorowania: {e}")
                 await interaction.response.send_message("❌ Wystąpił błąd.", ephemeral=True)
         
+        # Obsługa przycisku szczegółów oferty
+        elif custom_id.startswith('offer_details_'):
+            try:
+                await show_offer_details(interaction, int(custom_id.rsplit('_', 1)[1]))
+            except ValueError:
+                await interaction.response.send_message("❌ Nie znaleziono tej oferty.", ephemeral=True)
+        
         # Obsługa przycisku dodawania nowego monitorowania
         elif custom_id == "add_monitor_button":
             # Tworzymy klasę modalu do zbierania danych
@@ -280,7 +2071,7 @@ async def on_interaction(interaction):
                     if user_id not in user_configs:
                         user_configs[user_id] = []
                     
-                    user_configs[user_id].append(config)
+                    user_configs[user_id].append(registry.add(user_id, config))
                     
                     # Przygotowanie informacji do wyświetlenia
                     delivery_info = ""
@@ -308,7 +2099,8 @@ async def on_interaction(interaction):
                     # Tworzenie eleganckiego embeda z informacjami
                     embed = discord.Embed(
                         title=f"🔍 Nowe monitorowanie: {query}",
-                        description=f"Bot będzie sprawdzał nowe oferty co {INTERVAL} minut i wysyłał je na ten kanał.",
+                        description=f"Bot będzie sprawdzał nowe oferty i wysyłał je na ten kanał. Odstęp sprawdzania ({describe_poll_interval()}) "
+                                    "dostosowuje się do tego, jak często pojawiają się nowe oferty.",
                         color=discord.Color.green()
                     )
                     
@@ -378,51 +2170,51 @@ async def on_interaction(interaction):
             view = discord.ui.View()
             
             # Dla każdego monitorowania dodajemy pole w embedzie i przycisk do usunięcia
-            for i, config in enumerate(user_configs[user_id], 1):
+            for i, monitor in enumerate(user_configs[user_id], 1):
                 # Przygotowanie szczegółowych informacji
                 details = []
                 
-                if config.get('category'):
-                    details.append(f"📁 **Kategoria**: {config['category']}")
+                if monitor.category:
+                    details.append(f"📁 **Kategoria**: {monitor.category}")
                 
                 # Zakres cen
                 price_range = f"💰 **Cena**: "
-                if config.get('min_price') and config.get('max_price'):
-                    price_range += f"{config['min_price']} - {config['max_price']} zł"
-                elif config.get('min_price'):
-                    price_range += f"Od {config['min_price']} zł"
-                elif config.get('max_price'):
-                    price_range += f"Do {config['max_price']} zł"
+                if monitor.min_price and monitor.max_price:
+                    price_range += f"{monitor.min_price} - {monitor.max_price} zł"
+                elif monitor.min_price:
+                    price_range += f"Od {monitor.min_price} zł"
+                elif monitor.max_price:
+                    price_range += f"Do {monitor.max_price} zł"
                 else:
                     price_range += "Dowolna"
                 details.append(price_range)
                 
                 # Informacja o wysyłce
-                if config.get('delivery'):
-                    if config['delivery'] == "olx":
+                if monitor.delivery:
+                    if monitor.delivery == "olx":
                         details.append("📦 **Wysyłka**: Z wysyłką OLX")
-                    elif config['delivery'] == "free":
+                    elif monitor.delivery == "free":
                         details.append("📦 **Wysyłka**: Darmowa wysyłka")
                 
                 # Stan przedmiotu
-                if config.get('condition'):
-                    details.append(f"🏷️ **Stan**: {config['condition'].capitalize()}")
+                if monitor.condition:
+                    details.append(f"🏷️ **Stan**: {monitor.condition.capitalize()}")
                 
                 # Lokalizacja
-                if config.get('location'):
-                    details.append(f"📍 **Lokalizacja**: {config['location']}")
+                if monitor.location:
+                    details.append(f"📍 **Lokalizacja**: {monitor.location}")
                 
                 value = "\n".join(details)
                 
                 embed.add_field(
-                    name=f"{i}. {config['query']}",
+                    name=f"{i}. {monitor.query}",
                     value=value or "Brak dodatkowych filtrów",
                     inline=False
                 )
                 
                 # Dodajemy przycisk do usunięcia dla każdego monitorowania
                 delete_button = discord.ui.Button(
-                    label=f"Usuń #{i}: {config['query'][:20]}{'...' if len(config['query']) > 20 else ''}", 
+                    label=f"Usuń #{i}: {monitor.query[:20]}{'...' if len(monitor.query) > 20 else ''}", 
                     style=discord.ButtonStyle.danger, 
                     custom_id=f"remove_monitor_{i-1}_{user_id}",
                     row=i  # Ustawiamy przycisk w nowym wierszu
@@ -480,7 +2272,7 @@ async def monitor(ctx, *, params):
     if user_id not in user_configs:
         user_configs[user_id] = []
     
-    user_configs[user_id].append(config)
+    user_configs[user_id].append(registry.add(user_id, config))
     
     # Przygotowanie informacji o opcjonalnych filtrach
     delivery_info = ""
@@ -508,7 +2300,8 @@ async def monitor(ctx, *, params):
         f"Zakres cen: {min_price or 'od min'} - {max_price or 'do max'} zł\n"
         f"{delivery_info}\n{condition_info}\n{location_info}\n"
         f"Sortowanie: Według najnowszych\n"
-        f"Powiadomienia będą wysyłane do tego kanału co {INTERVAL} minut.",
+        f"Powiadomienia będą wysyłane do tego kanału. Odstęp sprawdzania ({describe_poll_interval()}) "
+        f"dostosowuje się do tego, jak często pojawiają się nowe oferty.",
         view=view
     )
 
@@ -526,21 +2319,21 @@ async def list_monitors(ctx):
         color=discord.Color.blue()
     )
     
-    for i, config in enumerate(user_configs[user_id], 1):
+    for i, monitor in enumerate(user_configs[user_id], 1):
         # Przygotowanie informacji o opcjach wysyłki
         delivery_info = ""
-        if config.get('delivery'):
-            if config['delivery'] == "olx":
+        if monitor.delivery:
+            if monitor.delivery == "olx":
                 delivery_info = "Tylko z wysyłką OLX"
-            elif config['delivery'] == "free":
+            elif monitor.delivery == "free":
                 delivery_info = "Tylko z darmową wysyłką"
         
-        value = f"Kategoria: {config['category'] or 'wszystkie'}\n" \
-                f"Cena: {config['min_price'] or 'min'} - {config['max_price'] or 'max'} zł\n" \
+        value = f"Kategoria: {monitor.category or 'wszystkie'}\n" \
+                f"Cena: {monitor.min_price or 'min'} - {monitor.max_price or 'max'} zł\n" \
                 f"{delivery_info}\n" \
                 f"Sortowanie: Według najnowszych"
         embed.add_field(
-            name=f"{i}. {config['query']}",
+            name=f"{i}. {monitor.query}",
             value=value,
             inline=False
         )
@@ -561,7 +2354,8 @@ async def remove_monitor(ctx, index: int):
         return
     
     removed = user_configs[user_id].pop(index - 1)
-    await ctx.send(f"✅ Usunięto monitorowanie dla: **{removed['query']}**")
+    registry.remove(removed)
+    await ctx.send(f"✅ Usunięto monitorowanie dla: **{removed.query}**")
 
 @bot.command(name='pomoc')
 async def help_command(ctx):
@@ -617,7 +2411,7 @@ async def help_command(ctx):
         inline=True
     )
     
-    embed.set_footer(text=f"Oferty są zawsze sortowane według najnowszych • Sprawdzanie co {INTERVAL} minut")
+    embed.set_footer(text=f"Oferty są zawsze sortowane według najnowszych • Sprawdzanie {describe_poll_interval()}, zależnie od liczby nowych ofert")
     
     # Dodanie przycisków do interakcji w bardziej atrakcyjnym stylu
     view = discord.ui.View()
@@ -642,107 +2436,770 @@ async def help_command(ctx):
     
     await ctx.send(embed=embed, view=view)
 
-@tasks.loop(minutes=INTERVAL)
-async def check_offers():
-    """Sprawdza nowe oferty dla wszystkich monitorowanych wyszukiwań"""
-    print(f"[{datetime.now()}] Sprawdzanie nowych ofert...")
-    for user_id, configs in user_configs.items():
-        for config in configs:
+@bot.command(name='status')
+@commands.has_permissions(administrator=True)
+async def status_command(ctx):
+    """Wyświetla stan pętli sprawdzania ofert - tylko dla administratorów"""
+    embed = discord.Embed(title="📊 Stan bota", color=discord.Color.blue())
+    
+    uptime = int(time.time() - metrics.started)
+    monitor_count = sum(len(configs) for configs in user_configs.values())
+    embed.description = f"Działa od {uptime // 3600} h {uptime % 3600 // 60} min • {monitor_count} monitorowań"
+    priming = scheduler.priming()
+    if priming:
+        embed.description += f" ({priming} czeka na wstępne sprawdzenie)"
+    
+    last = metrics.last_cycle
+    if last:
+        embed.add_field(
+            name="🔁 Ostatnia runda",
+            value=f"{last['finished']:%H:%M:%S}, {last['duration']:.1f} s\n"
+                  f"{last['due']} monitorowań, {last['searches']} zapytań\n"
+                  f"Ofert: {last['found']} znalezionych, {last['new']} nowych • Błędów: {last['errors']}",
+            inline=False
+        )
+    
+    stages = []
+    for stage in Metrics.STAGES:
+        histogram = metrics.histogram('olx_monitor_stage_seconds', stage=stage)
+        if histogram and histogram.count:
+            stages.append(f"`{stage}` p50 {histogram.quantile(0.5) * 1000:.0f} ms • p95 {histogram.quantile(0.95) * 1000:.0f} ms • {histogram.count}×")
+    embed.add_field(name="⏱️ Czas etapów", value="\n".join(stages) or "Brak pomiarów", inline=False)
+    
+    embed.add_field(
+        name="📦 Oferty",
+        value=f"Znalezione: {metrics.total('olx_monitor_offers_found_total')}\n"
+              f"Nowe: {metrics.total('olx_monitor_offers_new_total')}\n"
+              f"Wyciszone (start): {metrics.total('olx_monitor_offers_primed_total')}\n"
+              f"Pominięte promowane: {metrics.total('olx_monitor_offers_promoted_skipped_total')}\n"
+              f"Wysłane: {delivery_queue.sent_offers} (powtórzone: {delivery_queue.redundant})\n"
+              f"Połączone na kanale: {delivery_queue.merged}",
+        inline=True
+    )
+    embed.add_field(
+        name="📥 Kolejki",
+        value=f"Wysyłka: {delivery_queue.depth()}\n"
+              f"Zapytania w toku: {fetch_engine.in_flight}\n"
+              f"Odrzucone przez OLX: {fetch_engine.throttled} (ponowione: {fetch_engine.retried}, porzucone: {fetch_engine.dropped})\n"
+              f"Zapis ofert: {len(seen_offers.pending)}\n"
+              f"Zapis monitorowań: {len(registry.pending)}",
+        inline=True
+    )
+    
+    errors = metrics.errors()
+    embed.add_field(
+        name="⚠️ Błędy",
+        value="\n".join(f"`{stage}` {error_type}: {count}" for (stage, error_type), count in errors[:8]) or "Brak",
+        inline=False
+    )
+    if fetch_engine.breaker.is_open:
+        embed.set_footer(text="Pobieranie z OLX jest wstrzymane po wykryciu blokady")
+    
+    await ctx.send(embed=embed)
+
+def build_offer_embed(offer, monitors):
+    """Tworzy embed z ofertą - monitors to monitorowania kanału, do których oferta pasuje"""
+    monitor = monitors[0]
+    # Tworzenie bardziej atrakcyjnego embeda dla oferty
+    embed = discord.Embed(
+        title=offer['title'],
+        url=offer['url'],
+        color=discord.Color.from_rgb(5, 96, 252),  # Kolor OLX
+        description=f"💰 **Cena:** {offer['price']}"
+    )
+    
+    if offer['img_url']:
+        embed.set_thumbnail(url=offer['img_url'])
+    
+    # Dodanie informacji o dostawie i lokalizacji
+    info_fields = []
+    
+    if 'delivery' in offer and offer['delivery'] != "Brak informacji":
+        info_fields.append(f"📦 **Dostawa:** {offer['delivery']}")
+    
+    if 'location' in offer and offer['location'] != "Brak lokalizacji":
+        info_fields.append(f"📍 **Lokalizacja:** {offer['location']}")
+    
+    if info_fields:
+        embed.add_field(
+            name="Szczegóły oferty",
+            value="\n".join(info_fields),
+            inline=False
+        )
+    
+    # Dodanie informacji o wyszukiwaniu
+    search_details = [f"🔍 Wyszukiwanie: **{monitor.query}**"]
+    
+    if monitor.category:
+        search_details.append(f"📁 Kategoria: {monitor.category}")
+        
+    if monitor.min_price or monitor.max_price:
+        price_range = "💲 Zakres cen: "
+        if monitor.min_price and monitor.max_price:
+            price_range += f"{monitor.min_price} - {monitor.max_price} zł"
+        elif monitor.min_price:
+            price_range += f"od {monitor.min_price} zł"
+        elif monitor.max_price:
+            price_range += f"do {monitor.max_price} zł"
+        search_details.append(price_range)
+    
+    if len(monitors) > 1:
+        # Oferta wspólna dla kilku użytkowników kanału - jeden embed zamiast osobnego dla każdego
+        listed = [f"<@{other.user_id}> • {other.query}" for other in monitors[:EMBED_LISTED_MONITORS]]
+        if len(monitors) > EMBED_LISTED_MONITORS:
+            listed.append(f"…i {len(monitors) - EMBED_LISTED_MONITORS} więcej")
+        embed.add_field(name="🔔 Pasuje do monitorowań", value="\n".join(listed), inline=False)
+        search_details = [f"🔍 Wyszukiwania: {', '.join(dict.fromkeys(other.query for other in monitors[:EMBED_LISTED_MONITORS]))}"]
+    
+    embed.set_footer(text=" • ".join(search_details))
+    
+    # Dodanie daty znalezienia
+    embed.timestamp = datetime.now()
+    
+    return embed
+
+def build_offers_view(offers):
+    """Tworzy widok z przyciskami prowadzącymi do ofert z jednej wiadomości i przyciskami ich szczegółów"""
+    view = discord.ui.View()
+    for i, offer in enumerate(offers, 1):
+        # Tworzenie przycisków z ikonami
+        view.add_item(discord.ui.Button(
+            label="Zobacz na OLX" if len(offers) == 1 else f"{i}. {offer['title'][:40]}", 
+            style=discord.ButtonStyle.link, 
+            url=offer['url'],
+            emoji="🔍"
+        ))
+        # Szczegóły są pobierane dopiero po kliknięciu - numer wskazuje embed oferty w wiadomości
+        view.add_item(discord.ui.Button(
+            label="Szczegóły" if len(offers) == 1 else f"Szczegóły {i}",
+            style=discord.ButtonStyle.secondary,
+            custom_id=f"offer_details_{i - 1}",
+            emoji="📄"
+        ))
+    return view
+
+def build_details_embed(offer_embed, details):
+    """Tworzy embed ze szczegółami oferty pobranymi ze strony oferty"""
+    description = details['description'] or "Brak opisu"
+    if len(description) > DETAILS_DESCRIPTION_CHARS:
+        description = description[:DETAILS_DESCRIPTION_CHARS].rstrip() + "…"
+    embed = discord.Embed(
+        title=offer_embed.title,
+        url=offer_embed.url,
+        color=discord.Color.from_rgb(5, 96, 252),  # Kolor OLX
+        description=description
+    )
+    if offer_embed.thumbnail and offer_embed.thumbnail.url:
+        embed.set_thumbnail(url=offer_embed.thumbnail.url)
+    
+    if details['created']:
+        embed.add_field(name="🕒 Dodano", value=details['created'], inline=True)
+    if details['seller']:
+        seller = details['seller']
+        if details['seller_since']:
+            seller += f"\nNa OLX od {details['seller_since']}"
+        embed.add_field(name="👤 Sprzedający", value=seller, inline=True)
+    if details['location']:
+        embed.add_field(name="📍 Lokalizacja", value=details['location'], inline=True)
+    if details['params']:
+        embed.add_field(
+            name="📋 Parametry",
+            value="\n".join(f"**{name}:** {value}" for name, value in details['params'][:15])[:1024],
+            inline=False
+        )
+    return embed
+
+async def show_offer_details(interaction, index):
+    """Odpowiada na przycisk "Szczegóły" - adres oferty bierze z embeda wiadomości"""
+    embeds = interaction.message.embeds if interaction.message else []
+    if not 0 <= index < len(embeds) or not OLXScraper.is_offer_url(embeds[index].url):
+        await interaction.response.send_message("❌ Nie znaleziono tej oferty.", ephemeral=True)
+        return
+    
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    try:
+        details = await fetch_offer_details(embeds[index].url)
+    except aiohttp.ClientResponseError as e:
+        if e.status in (404, 410):
+            await interaction.followup.send("❌ Ta oferta nie jest już dostępna na OLX.", ephemeral=True)
+            return
+        metrics.error('details', e)
+        log.error(f"Błąd podczas pobierania szczegółów oferty: {e}")
+        await interaction.followup.send("❌ Nie udało się pobrać szczegółów oferty.", ephemeral=True)
+        return
+    except (ThrottledError, CircuitOpenError):
+        await interaction.followup.send("⏳ OLX chwilowo ogranicza zapytania - spróbuj ponownie za kilka minut.", ephemeral=True)
+        return
+    except Exception as e:
+        metrics.error('details', e)
+        log.error(f"Błąd podczas pobierania szczegółów oferty: {e}")
+        await interaction.followup.send("❌ Nie udało się pobrać szczegółów oferty.", ephemeral=True)
+        return
+    await interaction.followup.send(embed=build_details_embed(embeds[index], details), ephemeral=True)
+
+class ChannelQueue:
+    """Oferty czekające na wysłanie na jeden kanał"""
+    
+    def __init__(self):
+        self.items = deque()  # Pary (oferta, lista monitorowań, do których pasuje)
+        self.queued = {}  # Identyfikator oferty czekającej w kolejce -> jej lista monitorowań
+        self.overflow = Counter()  # Fraza wyszukiwania -> liczba ofert, które nie zmieściły się w kolejce
+        self.bucket = TokenBucket(CHANNEL_MESSAGES_PER_SECOND, CHANNEL_BURST)
+        self.worker = None
+        self.webhooks = None  # Pula (webhook, limit wysyłki) - None, dopóki kanał nie był zatłoczony, [] gdy webhooki są niedostępne
+        self.webhooks_retry = 0.0
+        self.recent = {}  # Adresy ostatnio wysłanych ofert (słownik jako uporządkowany zbiór)
+    
+    def remember(self, offers):
+        """Zapamiętuje wysłane oferty - zwraca liczbę ofert wysłanych na ten kanał już wcześniej"""
+        repeated = 0
+        for offer in offers:
+            key = OLXScraper.offer_key(offer)
+            if key in self.recent:
+                repeated += 1
+                del self.recent[key]
+            self.recent[key] = None
+        while len(self.recent) > RECENT_SENT_SIZE:
+            del self.recent[next(iter(self.recent))]
+        return repeated
+
+class DeliveryQueue:
+    """Kolejki wysyłki na kanały Discorda działające niezależnie od pobierania ofert
+    
+    Do 10 ofert trafia do jednej wiadomości. Gdy kanał nie nadąża, oferty ponad
+    CHANNEL_QUEUE_SIZE są zliczane i zgłaszane jedną wiadomością podsumowującą.
+    Oferta znaleziona w rundzie przez monitorowania kilku użytkowników tego samego
+    kanału jest wysyłana raz - jednym embedem z listą monitorowań. Przy DELIVERY_BACKEND=webhook
+    kanał z kolejką dłuższą niż jedna wiadomość wysyła równolegle przez pulę webhooków,
+    z których każdy ma własny limit - bez uprawnień do webhooków wysyła przez kanał.
+    """
+    
+    def __init__(self, queue_size=CHANNEL_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.channels = {}
+        self.sent_messages = 0
+        self.sent_offers = 0
+        self.redundant = 0  # Oferty wysłane ponownie na ten sam kanał
+        self.merged = 0  # Oferty dołączone do oferty czekającej już w kolejce kanału
+        self.collapsed = 0
+    
+    def depth(self):
+        return sum(len(queue.items) for queue in self.channels.values())
+    
+    def has_channel(self, channel_id):
+        return bot.get_channel(channel_id) is not None
+    
+    def enqueue(self, channel_id, offer, monitor):
+        """Dodaje ofertę do kolejki kanału - nigdy nie czeka, nadmiar trafia do podsumowania
+        
+        Wysyłka rusza dopiero w flush() na końcu rundy, aby oferty wspólne dla kilku monitorowań kanału zdążyły się połączyć.
+        """
+        queue = self.channels.get(channel_id)
+        if queue is None:
+            queue = self.channels[channel_id] = ChannelQueue()
+        monitors = queue.queued.get(offer['id'])
+        if monitors is not None:
+            if all(queued.user_id != monitor.user_id for queued in monitors):
+                monitors.append(monitor)
+            self.merged += 1
+        elif len(queue.items) < self.queue_size:
+            queue.queued[offer['id']] = monitors = [monitor]
+            queue.items.append((offer, monitors))
+        else:
+            queue.overflow[monitor.query] += 1
+            self.collapsed += 1
+    
+    def take_batch(self, queue):
+        """Zdejmuje z kolejki tyle ofert, ile zmieści się w jednej wiadomości - zwraca trójki (oferta, monitorowania, embed)"""
+        batch = []
+        chars = 0
+        while queue.items and len(batch) < EMBEDS_PER_MESSAGE:
+            offer, monitors = queue.items[0]
+            embed = build_offer_embed(offer, monitors)
+            if batch and chars + len(embed) > EMBED_CHARS_PER_MESSAGE:
+                break
+            queue.items.popleft()
+            del queue.queued[offer['id']]
+            chars += len(embed)
+            batch.append((offer, monitors, embed))
+        return batch
+    
+    def requeue(self, queue, batch):
+        """Zwraca niewysłane oferty na początek kolejki kanału"""
+        for offer, monitors, _ in reversed(batch):
+            queue.items.appendleft((offer, monitors))
+            queue.queued[offer['id']] = monitors
+    
+    async def send_batch(self, target, queue, batch):
+        """Wysyła jedną wiadomość z ofertami przez kanał albo webhook"""
+        kwargs = {}
+        if isinstance(target, discord.Webhook):
+            # Wiadomości z webhooków wyglądają jak wiadomości bota
+            kwargs = {'username': bot.user.name, 'avatar_url': bot.user.display_avatar.url}
+        with metrics.timer('olx_monitor_stage_seconds', stage='send'):
+            await target.send(embeds=[embed for _, _, embed in batch], view=build_offers_view([offer for offer, _, _ in batch]), **kwargs)
+        self.sent_offers += len(batch)
+        self.sent_messages += 1
+        self.redundant += queue.remember([offer for offer, _, _ in batch])
+    
+    async def webhook_pool(self, channel, queue):
+        """Zwraca pulę webhooków kanału - tworzy ją przy pierwszym zatłoczeniu, [] gdy bot nie może używać webhooków"""
+        if queue.webhooks is not None and (queue.webhooks or time.monotonic() < queue.webhooks_retry):
+            return queue.webhooks
+        queue.webhooks = []
+        queue.webhooks_retry = time.monotonic() + WEBHOOK_RETRY
+        # Webhooki mają tylko kanały tekstowe serwera (nie wątki ani wiadomości prywatne)
+        if not isinstance(channel, discord.TextChannel) or not channel.permissions_for(channel.guild.me).manage_webhooks:
+            return queue.webhooks
+        try:
+            webhooks = [webhook for webhook in await channel.webhooks() if webhook.name == WEBHOOK_NAME and webhook.user == bot.user]
+            while len(webhooks) < WEBHOOK_POOL_SIZE:
+                webhooks.append(await channel.create_webhook(name=WEBHOOK_NAME, reason="Wysyłka powiadomień o ofertach OLX"))
+        except discord.HTTPException as e:
+            metrics.error('send', e)
+            log.warning(f"Nie udało się przygotować webhooków na kanale {channel.id} - wysyłka przez kanał: {e}")
+            return queue.webhooks
+        queue.webhooks = [(webhook, TokenBucket(CHANNEL_MESSAGES_PER_SECOND, CHANNEL_BURST)) for webhook in webhooks[:WEBHOOK_POOL_SIZE]]
+        log.info(f"Kanał {channel.id} wysyła oferty przez {len(queue.webhooks)} webhooki")
+        return queue.webhooks
+    
+    async def run_webhook(self, queue, webhook, bucket):
+        """Wysyła oferty z kolejki kanału przez jeden webhook puli, dopóki kolejka jest zatłoczona"""
+        while len(queue.items) > EMBEDS_PER_MESSAGE:
+            await bucket.acquire()
+            batch = self.take_batch(queue)
+            if not batch:
+                return
             try:
-                offers = OLXScraper.search_olx(
-                    config['query'],
-                    category=config['category'],
-                    min_price=config['min_price'],
-                    max_price=config['max_price'],
-                    delivery_option=config.get('delivery'),
-                    condition=config.get('condition'),
-                    location=config.get('location'),
-                    sort_by=config.get('sort_by', 'newest')  # Domyślnie sortowanie wg najnowszych
-                )
-                
-                channel = bot.get_channel(config['channel_id'])
-                if not channel:
-                    print(f"Nie można znaleźć kanału o ID {config['channel_id']}")
+                await self.send_batch(webhook, queue, batch)
+            except (discord.NotFound, discord.Forbidden) as e:
+                # Webhook usunięty lub odebrane uprawnienia - oferty wracają do wysyłki przez kanał
+                metrics.error('send', e)
+                log.warning(f"Webhook kanału {webhook.channel_id} jest niedostępny - wysyłka przez kanał: {e}")
+                self.requeue(queue, batch)
+                queue.webhooks = []
+                queue.webhooks_retry = time.monotonic() + WEBHOOK_RETRY
+                return
+            except Exception as e:
+                metrics.error('send', e)
+                log.error(f"Błąd podczas wysyłania ofert przez webhook kanału {webhook.channel_id}: {e}")
+    
+    async def run_channel(self, channel_id, queue):
+        """Wysyła oferty z kolejki kanału z zachowaniem limitu wiadomości na kanał"""
+        while queue.items or queue.overflow:
+            if DELIVERY_BACKEND == 'webhook' and len(queue.items) > EMBEDS_PER_MESSAGE:
+                channel = bot.get_channel(channel_id)
+                pool = await self.webhook_pool(channel, queue) if channel else []
+                if pool:
+                    await asyncio.gather(*(self.run_webhook(queue, webhook, bucket) for webhook, bucket in pool))
                     continue
-                
-                new_offers = []
-                for offer in offers:
-                    offer_key = f"{user_id}_{offer['id']}"
-                    if offer_key not in seen_offers:
-                        seen_offers.add(offer_key)
-                        new_offers.append(offer)
-                
-                for offer in new_offers:
-                    # Tworzenie bardziej atrakcyjnego embeda dla oferty
-                    embed = discord.Embed(
-                        title=offer['title'],
-                        url=offer['url'],
-                        color=discord.Color.from_rgb(5, 96, 252),  # Kolor OLX
-                        description=f"💰 **Cena:** {offer['price']}"
-                    )
-                    
-                    if offer['img_url']:
-                        embed.set_thumbnail(url=offer['img_url'])
-                    
-                    # Dodanie informacji o dostawie i lokalizacji
-                    info_fields = []
-                    
-                    if 'delivery' in offer and offer['delivery'] != "Brak informacji":
-                        info_fields.append(f"📦 **Dostawa:** {offer['delivery']}")
-                    
-                    if 'location' in offer and offer['location'] != "Brak lokalizacji":
-                        info_fields.append(f"📍 **Lokalizacja:** {offer['location']}")
-                    
-                    if info_fields:
-                        embed.add_field(
-                            name="Szczegóły oferty",
-                            value="\n".join(info_fields),
-                            inline=False
-                        )
-                    
-                    # Dodanie informacji o wyszukiwaniu
-                    search_details = [f"🔍 Wyszukiwanie: **{config['query']}**"]
-                    
-                    if config.get('category'):
-                        search_details.append(f"📁 Kategoria: {config['category']}")
-                        
-                    if config.get('min_price') or config.get('max_price'):
-                        price_range = "💲 Zakres cen: "
-                        if config.get('min_price') and config.get('max_price'):
-                            price_range += f"{config['min_price']} - {config['max_price']} zł"
-                        elif config.get('min_price'):
-                            price_range += f"od {config['min_price']} zł"
-                        elif config.get('max_price'):
-                            price_range += f"do {config['max_price']} zł"
-                        search_details.append(price_range)
-                    
-                    embed.set_footer(text=" • ".join(search_details))
-                    
-                    # Dodanie daty znalezienia
-                    embed.timestamp = datetime.now()
-                    
-                    # Tworzenie przycisków z ikonami
-                    view = discord.ui.View()
-                    view.add_item(discord.ui.Button(
-                        label="Zobacz szczegóły", 
-                        style=discord.ButtonStyle.link, 
-                        url=offer['url'],
-                        emoji="🔍"
-                    ))
-                    
-                    
-                    await channel.send(embed=embed, view=view)
+            await queue.bucket.acquire()
+            channel = bot.get_channel(channel_id)
+            if not channel:
+                log.warning(f"Nie można znaleźć kanału o ID {channel_id}")
+                del self.channels[channel_id]
+                return
+            try:
+                if queue.items:
+                    batch = self.take_batch(queue)
+                    await self.send_batch(channel, queue, batch)
+                else:
+                    summary = ", ".join(f"**{query}** ({count})" for query, count in queue.overflow.most_common())
+                    skipped = sum(queue.overflow.values())
+                    queue.overflow.clear()
+                    with metrics.timer('olx_monitor_stage_seconds', stage='send'):
+                        await channel.send(f"⚠️ Zbyt wiele nowych ofert naraz - pominięto {skipped} powiadomień dla: {summary}. Sprawdź wyniki bezpośrednio na OLX.")
+                    self.sent_messages += 1
+            except Exception as e:
+                metrics.error('send', e)
+                log.error(f"Błąd podczas wysyłania ofert na kanał {channel_id}: {e}")
+    
+    async def flush(self):
+        """Uruchamia wysyłkę ofert zebranych w rundzie - odpowiednik EventPublisher.flush"""
+        for channel_id, queue in list(self.channels.items()):
+            if (queue.items or queue.overflow) and (queue.worker is None or queue.worker.done()):
+                queue.worker = asyncio.create_task(self.run_channel(channel_id, queue))
+    
+    def close(self):
+        for queue in self.channels.values():
+            if queue.worker is not None:
+                queue.worker.cancel()
+
+delivery_queue = DeliveryQueue()
+
+def deliver_offers(monitor, offers, prime=False):
+    """Kolejkuje do wysłania na kanał monitorowania oferty, których użytkownik jeszcze nie widział
+    
+    Przy wstępnym sprawdzeniu (prime=True) oferty są tylko oznaczane jako widziane.
+    """
+    if not delivery_queue.has_channel(monitor.channel_id):
+        log.warning(f"Nie można znaleźć kanału o ID {monitor.channel_id}")
+        return 0
+    
+    with metrics.timer('olx_monitor_stage_seconds', stage='dedup'):
+        new_ids = set(dedup_index.filter_new(monitor.user_id, monitor.signature, [offer['id'] for offer in offers]))
+        dedup_index.add(monitor.user_id, monitor.signature, new_ids)
+    
+    if prime:
+        metrics.inc('olx_monitor_offers_primed_total', len(new_ids))
+        return 0
+    
+    new_offers = []
+    for offer in offers:
+        if offer['id'] in new_ids:
+            new_ids.discard(offer['id'])  # Ta sama oferta może wystąpić na stronie kilka razy
+            new_offers.append(offer)
+    
+    for offer in new_offers:
+        delivery_queue.enqueue(monitor.channel_id, offer, monitor)
+    return len(new_offers)
+
+async def check_search(engine, plan):
+    """Pobiera raz wyniki wyszukiwania i rozsyła je do wszystkich monitorowań, które na nie czekają"""
+    # Czytamy wyniki do znacznika monitorowania, które widziało je najdawniej
+    stop_ids = set()
+    stop_created = None
+    for monitor in plan.subscribers:
+        schedule = scheduler.schedules.get(monitor.id)
+        if schedule is not None and schedule.watermark is not None:
+            ids, created = schedule.watermark
+            stop_ids |= ids
+            if created and (stop_created is None or created < stop_created):
+                stop_created = created
+    
+    try:
+        offers = await engine.scan(plan.url, plan.query_string, plan.signature, stop_ids, stop_created)
+    except asyncio.TimeoutError as e:
+        metrics.error('fetch', e)
+        log.warning(f"Przekroczono limit czasu dla wyszukiwania: {plan.url}")
+        return
+    except CircuitOpenError as e:
+        metrics.error('fetch', e)
+        return
+    except Exception as e:
+        metrics.error('fetch', e)
+        log.error(f"Błąd podczas wyszukiwania: {e}")
+        return
+    
+    watermark = build_watermark(offers)
+    for monitor in plan.subscribers:
+        try:
+            schedule = scheduler.schedules.get(monitor.id)
+            # Pierwsze sprawdzenie nowego monitorowania lub monitorowania wczytanego po restarcie tylko zapamiętuje oferty
+            prime = schedule is not None and not schedule.primed
+            # Monitorowanie bez znacznika (nowe lub po restarcie) dostaje tylko najnowsze oferty, jak dotąd
+            monitor_offers = offers if schedule is not None and schedule.watermark is not None else offers[:MAX_CARDS]
+            monitor_offers = [offer for offer in monitor_offers if OLXScraper.matches_filters(offer, monitor)]
+            if not prime:
+                fresh_offers = drop_stale_promoted(monitor_offers, schedule.watermark if schedule is not None else None)
+                metrics.inc('olx_monitor_offers_promoted_skipped_total', len(monitor_offers) - len(fresh_offers))
+                monitor_offers = fresh_offers
+            new_count = deliver_offers(monitor, monitor_offers, prime)
+            metrics.inc('olx_monitor_offers_found_total', len(monitor_offers))
+            metrics.inc('olx_monitor_offers_new_total', new_count)
+            scheduler.record(monitor.id, new_count, time.monotonic(), baseline=prime)
+            if schedule is not None:
+                schedule.primed = True
+                if watermark is not None:
+                    schedule.watermark = watermark
+        except Exception as e:
+            metrics.error('deliver', e)
+            log.error(f"Błąd podczas sprawdzania ofert: {e}")
+
+@tasks.loop(seconds=SCHEDULER_TICK)
+async def check_offers():
+    """Sprawdza monitorowania, których termin minął - kolejna runda zaczyna się dopiero po zakończeniu poprzedniej"""
+    # Kopia listy monitorowań - użytkownicy mogą je zmieniać w trakcie sprawdzania
+    monitors = {monitor.id: monitor for configs in list(user_configs.values()) for monitor in list(configs)}
+    now = time.monotonic()
+    scheduler.sync(monitors, now)
+    due_ids = scheduler.pop_due(now)
+    if not due_ids:
+        return
+    
+    # Wyszukiwanie pobrane dla monitorowania, którego termin minął, obsługuje też pozostałe monitorowania z tą samą sygnaturą
+    all_plans = plan_searches(monitors.values())
+    due_signatures = {plan.signature for plan in plan_searches(monitors[monitor_id] for monitor_id in due_ids).values()}
+    plans = [plan for signature, plan in all_plans.items() if signature in due_signatures]
+    served = sum(len(plan.subscribers) for plan in plans)
+    started = time.perf_counter()
+    found = metrics.total('olx_monitor_offers_found_total')
+    new = metrics.total('olx_monitor_offers_new_total')
+    errors = metrics.total('olx_monitor_errors_total')
+    log.info(f"Sprawdzanie nowych ofert: {len(due_ids)} monitorowań w terminie, "
+             f"{served} obsłużonych przez {len(plans)} zapytań (zaoszczędzono {served - len(plans)} pobrań)")
+    
+    await fetch_engine.start()
+    fetch_engine.prune(all_plans)
+    dedup_index.prune((monitor.user_id, plan.signature) for plan in all_plans.values() for monitor in plan.subscribers)
+    jobs = [asyncio.create_task(check_search(fetch_engine, plan)) for plan in plans]
+    try:
+        # Runda nie może trwać dłużej niż początkowy odstęp między sprawdzeniami
+        _, pending = await asyncio.wait(jobs, timeout=INTERVAL * 60)
+        if pending:
+            log.warning(f"Anulowano {len(pending)} niedokończonych sprawdzeń - runda przekroczyła {INTERVAL} min")
+    finally:
+        # Anulowanie niedokończonych zadań (przekroczony czas rundy lub zatrzymanie bota)
+        for job in jobs:
+            job.cancel()
+        await asyncio.gather(*jobs, return_exceptions=True)
+        # Monitorowania, których nie udało się sprawdzić, wracają do kolejki z dotychczasowym odstępem
+        now = time.monotonic()
+        for plan in plans:
+            for monitor in plan.subscribers:
+                schedule = scheduler.schedules.get(monitor.id)
+                if schedule is not None and schedule.due is None:
+                    scheduler.record(monitor.id, None, now)
+        # Jeden zapis widzianych ofert na rundę - po przekazaniu nowych ofert dalej, aby błąd nie zgubił powiadomień
+        # Błąd zapisu nie może przerwać pętli sprawdzania - tasks.loop zatrzymuje się po nieobsłużonym wyjątku
+        for flush in (delivery_queue.flush, seen_offers.flush):
+            try:
+                await flush()
             except Exception as e:
-                print(f"Błąd podczas sprawdzania ofert: {e}")
+                metrics.error('flush', e)
+                log.error(f"Błąd podczas zapisu wyników rundy: {e}")
+        duration = time.perf_counter() - started
+        metrics.observe('olx_monitor_cycle_seconds', duration)
+        metrics.inc('olx_monitor_cycles_total')
+        metrics.last_cycle = {
+            'finished': datetime.now(),
+            'duration': duration,
+            'due': len(due_ids),
+            'searches': len(plans),
+            'found': metrics.total('olx_monitor_offers_found_total') - found,
+            'new': metrics.total('olx_monitor_offers_new_total') - new,
+            'errors': metrics.total('olx_monitor_errors_total') - errors,
+        }
 
 # Limit ilości zapamiętanych ofert aby uniknąć wycieków pamięci
 @tasks.loop(hours=24)
 async def clear_old_offers():
-    """Czyści starsze oferty z pamięci"""
-    global seen_offers
-    if len(seen_offers) > 10000:
-        seen_offers = set(list(seen_offers)[-5000:])
-    print(f"[{datetime.now()}] Wyczyszczono pamięć ofert. Pozostało {len(seen_offers)} ofert.")
+    """Czyści starsze oferty z bazy widzianych ofert"""
+    remaining = await asyncio.to_thread(seen_offers.evict)
+    # Filtr Blooma nie pozwala usuwać wpisów - budujemy go od nowa z tego, co zostało w bazie
+    await dedup_index.rebuild()
+    report = dedup_index.memory_report()
+    log.info(f"Wyczyszczono pamięć ofert. Pozostało {remaining} ofert. "
+             f"Indeks w RAM: {report['total_bytes'] / 1024 / 1024:.1f} MB, {report['bytes_per_offer']:.1f} B na ofertę.")
+
+@tasks.loop(seconds=EVENT_POLL_INTERVAL)
+async def consume_events():
+    """Odbiera nowe oferty od procesów sprawdzających i kolejkuje je do wysłania na kanały"""
+    try:
+        while True:
+            events = await asyncio.to_thread(event_queue.take)
+            for channel_id, offer, monitor in events:
+                delivery_queue.enqueue(channel_id, offer, monitor)
+            metrics.inc('olx_monitor_events_received_total', len(events))
+            if len(events) < EVENT_BATCH_SIZE:
+                break
+    except sqlite3.Error as e:
+        metrics.error('events', e)
+        log.error(f"Błąd podczas odbierania ofert od procesów sprawdzających: {e}")
+    finally:
+        await delivery_queue.flush()
+
+def shard_owner(signature, workers):
+    """Rendezvous hashing - po zmianie składu procesów właściciela zmieniają tylko wyszukiwania procesu, który doszedł lub odszedł"""
+    return max(workers, key=lambda worker_id: hashlib.blake2b(f"{worker_id}|{signature}".encode(), digest_size=8).digest())
+
+def shard_configs(configs, workers, worker_id):
+    """Wybiera monitorowania należące do procesu - wyszukiwania o tej samej sygnaturze zawsze trafiają do jednego procesu"""
+    owned = {}
+    ring_keys = set()
+    monitors = (monitor for configs_list in configs.values() for monitor in configs_list)
+    for signature, plan in plan_searches(monitors).items():
+        if shard_owner(signature, workers) == worker_id:
+            for monitor in plan.subscribers:
+                owned.setdefault(monitor.user_id, []).append(monitor)
+                ring_keys.add((monitor.user_id, signature))
+    return owned, ring_keys
+
+async def run_scraper():
+    """Proces sprawdzający (python bot.py --scraper) - odpytuje OLX dla swojej części monitorowań bez połączenia z Discordem"""
+    global delivery_queue
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    stopping = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            asyncio.get_running_loop().add_signal_handler(signum, stopping.set)
+        except NotImplementedError:
+            pass  # Windows - zatrzymanie przez KeyboardInterrupt
+    
+    event_queue.open()
+    seen_offers.open()
+    delivery_queue = EventPublisher(event_queue)
+    await fetch_engine.start()
+    await dedup_index.rebuild()
+    await metrics.start_server(port=SCRAPER_METRICS_PORT)
+    log.info(f"Proces sprawdzający {worker_id} uruchomiony")
+    
+    configs = {}
+    known_ids = set()
+    revision = None  # (liczba, największe id) monitorowań przy ostatnim wczytaniu
+    workers = []
+    reshard = asyncio.Event()  # Ustawiane przez zgłoszenia, gdy zmienił się skład działających procesów
+    owned_keys = None
+    last_eviction = time.monotonic()
+    
+    async def heartbeat():
+        nonlocal workers
+        owned_count = sum(len(configs_list) for configs_list in user_configs.values())
+        try:
+            live, blocked_until = await asyncio.to_thread(event_queue.heartbeat, worker_id, owned_count, fetch_engine.breaker.blocked_until())
+        except sqlite3.Error as e:
+            metrics.error('heartbeat', e)
+            log.warning(f"Nie udało się zgłosić działania procesu sprawdzającego: {e}")
+            return
+        if blocked_until > time.time():
+            fetch_engine.breaker.hold(blocked_until - time.time())
+        if live != workers:
+            log.info(f"Działające procesy sprawdzające: {len(live)} - nowy podział monitorowań")
+            workers = live
+            reshard.set()
+            # Limit zapytań do OLX jest wspólny - każdy proces dostaje równą część
+            fetch_engine.limiter.rate = OLX_REQUESTS_PER_SECOND / max(1, len(workers))
+            fetch_engine.limiter.capacity = max(1, OLX_BURST // max(1, len(workers)))
+            fetch_engine.limiter.tokens = min(fetch_engine.limiter.tokens, fetch_engine.limiter.capacity)
+    
+    async def send_heartbeats():
+        # Zgłoszenia niezależne od rund - długa runda (limit zapytań, Retry-After) nie może wyglądać jak awaria procesu
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            await heartbeat()
+    
+    async def run_round():
+        nonlocal last_eviction
+        try:
+            await check_offers()
+            if time.monotonic() - last_eviction >= 24 * 3600:
+                last_eviction = time.monotonic()
+                await clear_old_offers()
+        except Exception as e:
+            # Błąd jednej rundy (np. zablokowana baza) nie zatrzymuje procesu sprawdzającego
+            metrics.error('cycle', e)
+            log.error(f"Błąd podczas rundy sprawdzania: {e}")
+    
+    await heartbeat()
+    heartbeats = asyncio.create_task(send_heartbeats())
+    try:
+        while not stopping.is_set():
+            if not workers:
+                # Bez udanego zgłoszenia nie znamy podziału monitorowań - czekamy na kolejne
+                try:
+                    await asyncio.wait_for(stopping.wait(), timeout=HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            changed = reshard.is_set()
+            reshard.clear()
+            current = await asyncio.to_thread(registry.revision)
+            if current != revision:
+                revision = current
+                configs = await asyncio.to_thread(registry.load)
+                changed = True
+            if changed:
+                owned, ring_keys = shard_configs(configs, workers, worker_id)
+                if owned_keys is not None:
+                    # Poprzedni właściciel mógł już wysłać oferty, których nie ma w naszym filtrze Blooma
+                    gained = ring_keys - owned_keys
+                    dedup_index.distrust(gained)
+                    # Przejęte monitorowania były już sprawdzane - ich pierwsze sprawdzenie u nas nie jest wyciszane.
+                    # Nowo dodane (nieznane przy poprzednim podziale) przechodzą zwykłe, ciche wstępne sprawdzenie.
+                    scheduler.adopt((monitor.id for monitors in owned.values() for monitor in monitors
+                                     if (monitor.user_id, monitor.signature) in gained and monitor.id in known_ids), time.monotonic())
+                owned_keys = ring_keys
+                # Monitorowania znane przy tym podziale - tylko one mogą być później przejęte od innego procesu
+                known_ids = {monitor.id for configs_list in configs.values() for monitor in configs_list}
+                user_configs.clear()
+                user_configs.update(owned)
+            
+            # Zatrzymanie przerywa trwającą rundę - check_offers anuluje sprawdzenia i zapisuje to, co już zebrało
+            round_task = asyncio.create_task(run_round())
+            stop_task = asyncio.create_task(stopping.wait())
+            await asyncio.wait((round_task, stop_task), return_when=asyncio.FIRST_COMPLETED)
+            if not round_task.done():
+                round_task.cancel()
+                await asyncio.gather(round_task, return_exceptions=True)
+                stop_task.cancel()
+                break
+            try:
+                await asyncio.wait_for(stop_task, timeout=SCHEDULER_TICK)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        log.info(f"Zatrzymywanie procesu sprawdzającego {worker_id}")
+        heartbeats.cancel()
+        await asyncio.gather(heartbeats, return_exceptions=True)
+        # Zapisy przerwanej rundy mogą jeszcze trwać w wątkach - czekamy na nie przed zamknięciem baz
+        await asyncio.get_running_loop().shutdown_default_executor()
+        try:
+            event_queue.leave(worker_id)
+        except sqlite3.Error as e:
+            log.error(f"Błąd podczas wyrejestrowania procesu sprawdzającego: {e}")
+        await fetch_engine.close()
+        await metrics.stop_server()
+        delivery_queue.close()
+        seen_offers.close()
+        event_queue.close()
+
+scraper_processes = {}  # Numer -> proces sprawdzający uruchomiony przez bota
+
+async def start_scrapers():
+    """Uruchamia brakujące procesy sprawdzające (SCRAPER_WORKERS) na tym samym komputerze co bot"""
+    for index in range(SCRAPER_WORKERS):
+        process = scraper_processes.get(index)
+        if process is not None and process.returncode is None:
+            continue
+        if process is not None:
+            log.warning(f"Proces sprawdzający #{index} zakończył się (kod {process.returncode}) - uruchamianie ponownie")
+        env = dict(os.environ, SCRAPER_METRICS_PORT=str(SCRAPER_METRICS_PORT + index if SCRAPER_METRICS_PORT else 0))
+        scraper_processes[index] = await asyncio.create_subprocess_exec(sys.executable, os.path.abspath(__file__), '--scraper', env=env)
+
+@tasks.loop(seconds=HEARTBEAT_INTERVAL)
+async def supervise_scrapers():
+    """Uruchamia ponownie procesy sprawdzające, które się zakończyły"""
+    await start_scrapers()
+
+async def stop_scrapers():
+    """Zatrzymuje procesy sprawdzające uruchomione przez bota (SIGTERM, a po HEARTBEAT_TIMEOUT sekundach kill)"""
+    supervise_scrapers.cancel()
+    for process in scraper_processes.values():
+        if process.returncode is None:
+            process.terminate()
+    for process in scraper_processes.values():
+        try:
+            await asyncio.wait_for(process.wait(), timeout=HEARTBEAT_TIMEOUT)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+    scraper_processes.clear()
+
+# Wartości odczytywane z obiektów bota przy każdym pobraniu /metrics
+metrics.collect('olx_monitor_monitors', 'gauge', "Liczba monitorowań", lambda: sum(len(configs) for configs in user_configs.values()))
+metrics.collect('olx_monitor_overdue_monitors', 'gauge', "Monitorowania, których termin sprawdzenia minął",
+                lambda: sum(1 for schedule in scheduler.schedules.values() if schedule.due is not None and schedule.due <= time.monotonic()))
+metrics.collect('olx_monitor_priming_monitors', 'gauge', "Monitorowania czekające na wstępne (ciche) sprawdzenie", lambda: scheduler.priming())
+metrics.collect('olx_monitor_fetch_in_flight', 'gauge', "Zapytania do OLX w toku", lambda: fetch_engine.in_flight)
+metrics.collect('olx_monitor_fetch_not_modified_total', 'counter', "Odpowiedzi 304 - strona bez zmian", lambda: fetch_engine.not_modified)
+metrics.collect('olx_monitor_fetch_unchanged_total', 'counter', "Strony z niezmienioną listą kart - bez parsowania", lambda: fetch_engine.unchanged)
+metrics.collect('olx_monitor_fetch_reused_offers_total', 'counter', "Oferty wzięte z poprzedniego parsowania strony", lambda: fetch_engine.reused)
+metrics.collect('olx_monitor_fetch_throttled_total', 'counter', "Zapytania odrzucone przez OLX (429/403 lub strona blokady)", lambda: fetch_engine.throttled)
+metrics.collect('olx_monitor_fetch_retried_total', 'counter', "Ponowione zapytania do OLX", lambda: fetch_engine.retried)
+metrics.collect('olx_monitor_fetch_dropped_total', 'counter', "Porzucone zapytania do OLX", lambda: fetch_engine.dropped)
+metrics.collect('olx_monitor_breaker_open', 'gauge', "1, gdy pobieranie jest wstrzymane po wykryciu blokady", lambda: int(fetch_engine.breaker.is_open))
+metrics.collect('olx_monitor_delivery_queue_depth', 'gauge', "Oferty czekające na wysłanie", lambda: delivery_queue.depth())
+metrics.collect('olx_monitor_delivery_channels', 'gauge', "Kanały z aktywną kolejką wysyłki", lambda: len(delivery_queue.channels))
+metrics.collect('olx_monitor_sent_messages_total', 'counter', "Wysłane wiadomości", lambda: delivery_queue.sent_messages)
+metrics.collect('olx_monitor_sent_offers_total', 'counter', "Wysłane oferty", lambda: delivery_queue.sent_offers)
+metrics.collect('olx_monitor_redundant_offers_total', 'counter', "Oferty wysłane ponownie na ten sam kanał", lambda: delivery_queue.redundant)
+metrics.collect('olx_monitor_merged_offers_total', 'counter', "Oferty połączone z tą samą ofertą innego monitorowania kanału", lambda: delivery_queue.merged)
+metrics.collect('olx_monitor_webhook_channels', 'gauge', "Kanały wysyłające oferty przez pulę webhooków",
+                lambda: sum(1 for queue in delivery_queue.channels.values() if queue.webhooks))
+metrics.collect('olx_monitor_collapsed_offers_total', 'counter', "Oferty pominięte przy przepełnieniu kolejki kanału", lambda: delivery_queue.collapsed)
+metrics.collect('olx_monitor_details_cached', 'gauge', "Szczegóły ofert w pamięci przycisku Szczegóły", lambda: len(offer_details.entries))
+metrics.collect('olx_monitor_seen_pending', 'gauge', "Widziane oferty czekające na zapis w bazie", lambda: len(seen_offers.pending))
+metrics.collect('olx_monitor_registry_pending', 'gauge', "Zmiany monitorowań czekające na zapis w bazie", lambda: len(registry.pending))
 
 @bot.event
 async def on_command_error(ctx, error):
@@ -750,12 +3207,19 @@ async def on_command_error(ctx, error):
         await ctx.send(f"❌ Nieznana komenda. Użyj `{PREFIX}pomoc` aby zobaczyć dostępne komendy.")
     elif isinstance(error, commands.MissingRequiredArgument):
         await ctx.send(f"❌ Brakujący argument. Użyj `{PREFIX}pomoc` aby zobaczyć poprawne użycie.")
+    elif isinstance(error, (commands.MissingPermissions, commands.NoPrivateMessage)):
+        await ctx.send("❌ Ta komenda jest dostępna tylko dla administratorów serwera.")
     else:
         await ctx.send(f"❌ Wystąpił błąd: {error}")
-        print(f"Błąd: {error}")
+        log.error(f"Błąd: {error}")
 
 # Uruchomienie bota
 if __name__ == "__main__":
     # Zadanie clear_old_offers zostanie uruchomione automatycznie po uruchomieniu bota
     # dzięki dekoratorowi @tasks.loop
-    bot.run(TOKEN)
+    setup_logging()
+    if '--scraper' in sys.argv[1:]:
+        asyncio.run(run_scraper())
+    else:
+        bot.run(TOKEN, log_handler=None)
+    log_listener.stop()